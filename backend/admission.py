@@ -0,0 +1,346 @@
+"""
+Per-tenant rate limits and cost-weighted admission control for the parse endpoints.
+
+A tenant is a known API key (X-API-Key, listed in API_KEYS) or else the
+client IP. Each request is weighed in cost units: one unit per document
+plus one per MB, and for PDFs one unit per page instead of the flat
+document unit (estimate_cost). Two limits apply:
+
+  rate      a token bucket per tenant, refilled at `rate` units/s up to
+            `burst`. A tenant over its rate gets 429 with the seconds until
+            its bucket has room as Retry-After.
+  capacity  the total cost of requests being served at once. A request
+            that does not fit, or that would take one tenant past its
+            `tenant_share` of it, gets 503 with Retry-After. A request on
+            its own is always let in, however large.
+
+AdmissionMiddleware checks both before the body is read, weighing the
+request from its Content-Length, so a rejected upload is never buffered.
+Once the files have been read, the endpoint re-weighs the request from
+their real type and page count (AdmissionControl.resize); going over then
+still answers 503, and the extra cost is charged to the tenant's bucket.
+An endpoint can keep the ticket past its response (Ticket.detached), as
+/jobs does until the job has run.
+
+State lives in this process (MemoryState), or in a SQLite file (SqliteState)
+that several API workers on one host share: each check is one IMMEDIATE
+transaction, run in a thread so waiting for another worker's lock never
+blocks the event loop. A check that cannot get the lock in time answers 503
+("busy"). Reservations carry a lease so a worker that dies does not hold
+capacity forever.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+import metrics
+from extractors import PDF_MAX_PAGES, SNIFF_BYTES, sniff_type
+
+MB = 1024 * 1024
+PDF_PAGE_RE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+PDF_BYTES_PER_PAGE = 100 * 1024  # page estimate when the page objects are compressed
+RETRY_AFTER_S = 1                # for 503s, as the pool's own QueueFull
+LOCK_TIMEOUT_S = 5               # wait for another worker's lock on the shared state, then answer 503
+LEASE_S = 600                    # a shared reservation not released by then is dropped
+PRUNE_EVERY = 1000               # admissions between sweeps of idle buckets
+
+Verdict = Optional[Tuple[str, float]]  # (reason, retry after in s), None = admitted
+
+
+def estimate_cost(raw: bytes) -> float:
+    """Cost units for one document: pages (PDF) or 1 (DOCX, TXT), plus its size in MB."""
+    units = len(raw) / MB
+    if sniff_type(raw[:SNIFF_BYTES]) == ".pdf":
+        # counting page objects is cheap; PDFs with object streams hide them, so fall back to size
+        pages = len(PDF_PAGE_RE.findall(raw)) or math.ceil(len(raw) / PDF_BYTES_PER_PAGE)
+        return units + min(max(pages, 1), PDF_MAX_PAGES)
+    return units + 1
+
+def request_cost(content_length: Optional[bytes]) -> float:
+    """Cost units of a request before its body is read: 1 plus its declared size in MB."""
+    if content_length is not None and content_length.isdigit():
+        return 1 + int(content_length) / MB
+    return 1.0
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def response(self) -> JSONResponse:
+        return JSONResponse({"detail": self.detail}, status_code=self.status_code,
+                            headers={"Retry-After": str(max(1, math.ceil(self.retry_after)))})
+
+
+@dataclass
+class Limits:
+    rate: float          # units/s per tenant (0 = no rate limit)
+    burst: float         # bucket size in units
+    capacity: float      # units served at once across tenants (0 = unlimited)
+    tenant_share: float  # fraction of capacity one tenant may hold
+
+    def refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def decide(self, tokens: float, charge: float, check_rate: bool, total: float, mine: float,
+               cost: float) -> Verdict:
+        """total / mine: cost already in flight overall / for this tenant, without this request."""
+        if self.rate > 0 and check_rate and tokens < charge:
+            return "rate", (charge - tokens) / self.rate
+        if self.capacity > 0:
+            if total > 0 and total + cost > self.capacity:
+                return "capacity", RETRY_AFTER_S
+            if mine > 0 and mine + cost > self.capacity * self.tenant_share:
+                return "tenant", RETRY_AFTER_S
+        return None
+
+    def idle_s(self) -> float:
+        """After this long without requests a bucket is full again and need not be kept."""
+        return self.burst / self.rate if self.rate > 0 else 0.0
+
+
+class MemoryState:
+    """Limit state for this process only."""
+
+    def __init__(self):
+        self.buckets: Dict[str, Tuple[float, float]] = {}   # tenant -> (tokens, updated)
+        self.tickets: Dict[str, Tuple[str, float]] = {}     # ticket -> (tenant, cost)
+
+    def reserve(self, limits: Limits, ticket: str, tenant: str, cost: float, charge: float,
+                check_rate: bool, now: float) -> Tuple[Verdict, float]:
+        """Set the ticket's cost to `cost` and take `charge` from the tenant's bucket, if the limits allow."""
+        tokens = limits.refill(*self.buckets.get(tenant, (limits.burst, now)), now)
+        total = mine = 0.0
+        for tid, (owner, c) in self.tickets.items():
+            if tid != ticket:
+                total += c
+                mine += c if owner == tenant else 0.0
+        verdict = limits.decide(tokens, charge, check_rate, total, mine, cost)
+        if verdict is None:
+            if limits.rate > 0:
+                self.buckets[tenant] = (tokens - charge, now)
+            self.tickets[ticket] = (tenant, cost)
+            total += cost
+        else:
+            total += self.tickets.get(ticket, (tenant, 0.0))[1]
+        return verdict, total
+
+    def release(self, ticket: str) -> float:
+        self.tickets.pop(ticket, None)
+        return sum(c for _, c in self.tickets.values())
+
+    def prune(self, limits: Limits, now: float) -> None:
+        idle = limits.idle_s()
+        self.buckets = {t: b for t, b in self.buckets.items() if now - b[1] < idle}
+
+    def usage(self) -> Dict:
+        return {"in_use": round(sum(c for _, c in self.tickets.values()), 2),
+                "requests": len(self.tickets), "tenants": len(self.buckets)}
+
+
+class SqliteState:
+    """Limit state in a SQLite file shared by the API workers on this host."""
+
+    def __init__(self, path: str):
+        # autocommit mode: every check below runs in its own explicit transaction
+        self._db = sqlite3.connect(path, timeout=LOCK_TIMEOUT_S, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()  # one transaction at a time on this connection
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS buckets (tenant TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                         "updated REAL NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS tickets (id TEXT PRIMARY KEY, tenant TEXT NOT NULL, "
+                         "cost REAL NOT NULL, expires REAL NOT NULL)")
+
+    def _transaction(self, work):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")  # takes the write lock now, so the read-check-write is atomic
+            try:
+                out = work()
+                self._db.execute("COMMIT")
+                return out
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _total(self) -> float:
+        return self._db.execute("SELECT COALESCE(SUM(cost), 0) FROM tickets").fetchone()[0]
+
+    def reserve(self, limits: Limits, ticket: str, tenant: str, cost: float, charge: float,
+                check_rate: bool, now: float) -> Tuple[Verdict, float]:
+        def work():
+            db = self._db
+            db.execute("DELETE FROM tickets WHERE expires < ?", (now,))
+            row = db.execute("SELECT tokens, updated FROM buckets WHERE tenant = ?", (tenant,)).fetchone()
+            tokens = limits.refill(*(row or (limits.burst, now)), now)
+            total, mine = db.execute(
+                "SELECT COALESCE(SUM(cost), 0), COALESCE(SUM(CASE WHEN tenant = ? THEN cost END), 0) "
+                "FROM tickets WHERE id != ?", (tenant, ticket)).fetchone()
+            verdict = limits.decide(tokens, charge, check_rate, total, mine, cost)
+            if verdict is None and limits.rate > 0:
+                db.execute("INSERT OR REPLACE INTO buckets (tenant, tokens, updated) VALUES (?, ?, ?)",
+                           (tenant, tokens - charge, now))
+            if verdict is None:
+                db.execute("INSERT OR REPLACE INTO tickets (id, tenant, cost, expires) VALUES (?, ?, ?, ?)",
+                           (ticket, tenant, cost, now + LEASE_S))
+            return verdict, self._total()
+        return self._transaction(work)
+
+    def release(self, ticket: str) -> float:
+        def work():
+            self._db.execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+            return self._total()
+        return self._transaction(work)
+
+    def prune(self, limits: Limits, now: float) -> None:
+        self._transaction(lambda: self._db.execute("DELETE FROM buckets WHERE updated < ?",
+                                                   (now - limits.idle_s(),)))
+
+    def usage(self) -> Dict:
+        with self._lock:
+            total, requests = self._db.execute("SELECT COALESCE(SUM(cost), 0), COUNT(*) FROM tickets").fetchone()
+            tenants = self._db.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+        return {"in_use": round(total, 2), "requests": requests, "tenants": tenants}
+
+
+@dataclass
+class Ticket:
+    """One admitted request's reservation."""
+    id: str
+    tenant: str
+    cost: float
+    detached: bool = False  # released by whoever took it over, not when the response is sent
+
+
+class AdmissionControl:
+    def __init__(self, rate: float = 0, burst: float = 0, capacity: float = 0, tenant_share: float = 1.0,
+                 db_path: Optional[str] = None, api_keys: Iterable[str] = ()):
+        self.limits = Limits(rate, burst or max(rate, 1.0), capacity, tenant_share)
+        self.state = SqliteState(db_path) if db_path else MemoryState()
+        self.shared = db_path is not None
+        self.api_keys = {k for k in api_keys if k}
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"rate": 0, "capacity": 0, "tenant": 0, "busy": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.limits.rate > 0 or self.limits.capacity > 0
+
+    def tenant(self, api_key: Optional[bytes], client: Optional[Tuple[str, int]]) -> str:
+        """
+        A known API key, else the client address. Unknown keys are not
+        trusted, or a client could dodge its limit by sending a new key each time.
+        """
+        if api_key and api_key.decode("latin-1") in self.api_keys:
+            return "key:" + hashlib.sha256(api_key).hexdigest()[:16]
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def admit(self, tenant: str, cost: float) -> Ticket:
+        """Reserve `cost` for a new request and charge it to the tenant's bucket, or raise Rejected."""
+        ticket = Ticket(uuid.uuid4().hex, tenant, cost)
+        charge = min(cost, self.limits.burst)  # a request larger than the bucket still gets through when it is full
+        await self._reserve(ticket, cost, charge, check_rate=True)
+        self.admitted += 1
+        if self.limits.rate > 0 and self.admitted % PRUNE_EVERY == 0:
+            try:
+                await self._call(self.state.prune, self.limits, time.time())
+            except sqlite3.OperationalError:  # lock timeout; the next sweep catches up
+                pass
+        return ticket
+
+    async def resize(self, ticket: Ticket, cost: float) -> None:
+        """Re-weigh an admitted request once its files are read; any extra cost goes on the tenant's bucket."""
+        await self._reserve(ticket, cost, max(0.0, cost - ticket.cost), check_rate=False)
+        ticket.cost = cost
+
+    async def release(self, ticket: Ticket) -> None:
+        try:
+            metrics.ADMISSION_IN_USE.set(await self._call(self.state.release, ticket.id))
+        except sqlite3.OperationalError:  # lock timeout; the lease frees it after LEASE_S
+            pass
+
+    async def _call(self, fn, *args):
+        """Shared state waits on other workers' locks, so it is used from a thread."""
+        if self.shared:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _reserve(self, ticket: Ticket, cost: float, charge: float, check_rate: bool) -> None:
+        try:
+            verdict, in_use = await self._call(self.state.reserve, self.limits, ticket.id, ticket.tenant, cost,
+                                               charge, check_rate, time.time())
+        except sqlite3.OperationalError:
+            verdict, in_use = ("busy", RETRY_AFTER_S), None
+        if in_use is not None:
+            metrics.ADMISSION_IN_USE.set(in_use)
+        if verdict is None:
+            return
+        reason, retry_after = verdict
+        self.rejected[reason] += 1
+        metrics.ADMISSION_REJECTED.inc(reason=reason)
+        if reason == "rate":
+            raise Rejected(429, "Rate limit exceeded. Try again later.", retry_after)
+        if reason == "tenant":
+            raise Rejected(503, "Too many of your requests are being parsed. Try again shortly.", retry_after)
+        if reason == "busy":
+            raise Rejected(503, "Admission state is busy. Try again shortly.", retry_after)
+        raise Rejected(503, "Parser is at capacity. Try again shortly.", retry_after)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "rate": self.limits.rate,
+            "burst": self.limits.burst,
+            "capacity": self.limits.capacity,
+            "tenant_share": self.limits.tenant_share,
+            **self.state.usage(),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Admits POSTs to `paths` before their body is read. The ticket is put on
+    the request state (request.state.admission) for the endpoint to resize,
+    and released when the response has been sent, streamed ones included,
+    unless the endpoint detached it.
+    """
+
+    def __init__(self, app, control: AdmissionControl, paths: Iterable[str]):
+        self.app = app
+        self.control = control
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths
+                or not self.control.enabled):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        tenant = self.control.tenant(headers.get(b"x-api-key"), scope.get("client"))
+        try:
+            ticket = await self.control.admit(tenant, request_cost(headers.get(b"content-length")))
+        except Rejected as e:
+            await e.response()(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["admission"] = ticket
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if not ticket.detached:
+                await self.control.release(ticket)
@@ -0,0 +1,111 @@
+"""
+Reading resumes out of ZIP and tar uploads one member at a time.
+
+The upload is read in place (Starlette keeps it in a spooled temporary
+file), nothing is extracted. Members are decompressed one at a time as the
+caller asks for them. A member that cannot be used is yielded with a
+ParseError so it still gets a result line. Skipped silently: directories,
+macOS metadata (__MACOSX/, ._*) and .DS_Store.
+"""
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
+
+from pipeline import ParseError
+
+TAR_COMPRESSED_MAGIC = (b"\x1f\x8b", b"BZh", b"\xfd7zXZ\x00")
+
+
+@dataclass
+class Member:
+    name: str
+    raw: Optional[bytes] = None
+    error: Optional[ParseError] = None
+
+
+def sniff_archive(head: bytes) -> Optional[str]:
+    """"zip" or "tar" (plain, gzip, bzip2 or xz) judged from the first 512 bytes."""
+    if head.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return "zip"
+    if head[257:262] == b"ustar" or head.startswith(TAR_COMPRESSED_MAGIC):
+        return "tar"
+    return None
+
+def _skipped(name: str) -> bool:
+    base = name.rstrip("/").rsplit("/", 1)[-1]
+    return name.endswith("/") or name.startswith("__MACOSX/") or base.startswith("._") or base == ".DS_Store"
+
+def _too_large(name: str, max_bytes: int) -> Member:
+    return Member(name, error=ParseError(413, f"File too large. Max is {max_bytes // (1024 * 1024)} MB."))
+
+def _too_many(max_members: int) -> Member:
+    return Member("", error=ParseError(413, f"Archive has more than {max_members} files; the rest were skipped."))
+
+
+def open_archive(fileobj: BinaryIO, max_bytes: int, max_members: int) -> Iterator[Member]:
+    """
+    Check the archive and return an iterator over its members.
+
+    Problems with the archive as a whole raise ParseError here, before any
+    member is read. max_bytes applies to each decompressed member.
+    """
+    fileobj.seek(0)
+    head = fileobj.read(512)
+    fileobj.seek(0)
+    kind = sniff_archive(head)
+    try:
+        if kind == "zip":
+            archive = zipfile.ZipFile(fileobj)
+            names = set(archive.namelist())
+            if "word/document.xml" in names and "[Content_Types].xml" in names:
+                raise ParseError(400, "This is a DOCX file, not an archive; upload it to /parse.")
+            return _iter_zip(archive, max_bytes, max_members)
+        if kind == "tar":
+            # "r|*": a forward-only stream, decompressed as it is read
+            return _iter_tar(tarfile.open(fileobj=fileobj, mode="r|*"), max_bytes, max_members)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ParseError(400, f"Could not read archive: {e}")
+    raise ParseError(400, "Unsupported archive type (expected ZIP or tar, optionally gzip/bzip2/xz compressed).")
+
+def _iter_zip(archive: zipfile.ZipFile, max_bytes: int, max_members: int) -> Iterator[Member]:
+    with archive:
+        count = 0
+        for info in archive.infolist():
+            if info.is_dir() or _skipped(info.filename):
+                continue
+            count += 1
+            if count > max_members:
+                yield _too_many(max_members)
+                return
+            if info.file_size > max_bytes:
+                yield _too_large(info.filename, max_bytes)
+                continue
+            try:
+                with archive.open(info) as fh:
+                    raw = fh.read(max_bytes + 1)  # the header's size may lie
+            except (RuntimeError, zipfile.BadZipFile, NotImplementedError) as e:  # encrypted, corrupt, unknown method
+                yield Member(info.filename, error=ParseError(400, f"Could not read archive member: {e}"))
+                continue
+            if len(raw) > max_bytes:
+                yield _too_large(info.filename, max_bytes)
+                continue
+            yield Member(info.filename, raw)
+
+def _iter_tar(archive: tarfile.TarFile, max_bytes: int, max_members: int) -> Iterator[Member]:
+    with archive:
+        count = 0
+        try:
+            for info in archive:
+                if not info.isfile() or _skipped(info.name):
+                    continue
+                count += 1
+                if count > max_members:
+                    yield _too_many(max_members)
+                    return
+                if info.size > max_bytes:
+                    yield _too_large(info.name, max_bytes)
+                    continue
+                yield Member(info.name, archive.extractfile(info).read())
+        except (tarfile.TarError, EOFError, OSError) as e:
+            yield Member("", error=ParseError(400, f"Archive is truncated or corrupt: {e}"))
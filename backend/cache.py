@@ -0,0 +1,139 @@
+"""
+Content-addressed cache of parse results.
+
+Keys are the SHA-256 of the uploaded bytes plus the model version, so a new
+model never serves results produced by an old one. Lookups go through an
+in-memory LRU first and then, if configured, a SQLite file that survives
+restarts. Only successful results are cached; the filename is not part of
+the cached payload since the same bytes may arrive under different names.
+
+The SQLite tier is read and written in a thread, so disk I/O never blocks
+the event loop, and holds at most max_disk_items rows: each row records
+when it was last written or read from disk, and every EVICT_EVERY writes
+the least recently used rows past the cap are deleted.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+EVICT_EVERY = 100  # disk writes between evictions, so the file may briefly hold this many extra rows
+
+
+def model_version(model_dir) -> str:
+    meta_path = Path(model_dir) / "meta.json"
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return "unknown"
+    return f"{meta.get('lang', '')}_{meta.get('name', '')}-{meta.get('version', '')}"
+
+
+class ResultCache:
+    def __init__(self, version: str, max_items: int = 512, db_path: Optional[str] = None,
+                 max_disk_items: int = 50000):
+        self.version = version
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items  # 0 = no cap
+        self._lru: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                             "used REAL NOT NULL DEFAULT 0)")
+            if "used" not in {row[1] for row in self._db.execute("PRAGMA table_info(results)")}:
+                self._db.execute("ALTER TABLE results ADD COLUMN used REAL NOT NULL DEFAULT 0")  # older files
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+            self._evict()
+            self._db.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, digest: str, *variant: Optional[str]) -> str:
+        """
+        digest is the upload's sha256 (see digest()). variant separates the
+        same bytes parsed differently (file type, PDF engine, model).
+        """
+        parts = ":".join(v or "" for v in variant)
+        return f"{self.version}:{parts}:{digest}"
+
+    @staticmethod
+    def digest(raw: bytes) -> str:
+        return hashlib.sha256(raw).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._lru[key]
+        value = await asyncio.to_thread(self._read, key) if self._db is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self._remember(key, value)
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    async def put(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._remember(key, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._write, key, value)
+
+    # ---------- SQLite tier (called in a thread) ----------
+    def _read(self, key: str) -> Optional[Dict]:
+        with self._db_lock:
+            row = self._db.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def _write(self, key: str, value: Dict) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO results (key, payload, used) VALUES (?, ?, ?)",
+                             (key, payload, time.time()))
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Delete the least recently used rows past max_disk_items (caller commits)."""
+        if self.max_disk_items > 0:
+            self._db.execute("DELETE FROM results WHERE key IN "
+                             "(SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_disk_items,))
+
+    def _remember(self, key: str, value: Dict) -> None:
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "items": len(self._lru),
+            "max_items": self.max_items,
+            "disk": self._db is not None,
+            "max_disk_items": self.max_disk_items if self._db is not None else 0,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
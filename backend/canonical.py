@@ -0,0 +1,144 @@
+"""
+Canonical skill / language names.
+
+NER returns surface forms ("Python", "python ", "Python 3", "Node.js",
+"NodeJS"). normalize() reduces each to a key. The key is casefolded, with
+version suffixes, separators, and for languages the proficiency levels
+removed. The CanonicalIndex maps keys to canonical ids with a single dict
+lookup per entity.
+
+The index is built from the dictionaries in terms.py and the annotated
+training data by training/build_term_index.py, and saved as
+term_index.json next to this module. Each process loads that file once
+(pipeline.get_term_index). If the file is missing, an index is built from
+the dictionaries alone. Entities that are not in the index get an id made
+from their own key, so they are still merged with their variants.
+"""
+import hashlib
+import json
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from terms import LANGUAGE_TERMS, SKILL_TERMS, expand_term
+
+CANONICAL_LABELS = ("Skill", "Language")
+
+LEVEL_WORDS = (
+    "native", "fluent", "advanced", "intermediate", "beginner", "basic", "proficient", "proficiency",
+    "conversational", "professional", "working", "knowledge", "full", "limited", "elementary", "upper",
+    "mother", "tongue", "bilingual", "of", "level",
+)
+_LEVEL_RE = re.compile(r"\b(?:" + "|".join(LEVEL_WORDS) + r"|[abc][12])\b")
+_BRACKETS_RE = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_VERSION_RE = re.compile(r"\s+v?\d+(?:\.\d+)*\+?$")
+_EDGE_PUNCT = " \t\r\n,;:.•·*-–—|/"
+_SEPARATORS_RE = re.compile(r"[\s\-_.]+")
+
+
+@lru_cache(maxsize=65536)
+def normalize(label: str, text: str) -> str:
+    """Lookup key for an entity text: "Python 3" -> "python", "English (C1)" -> "english"."""
+    key = unicodedata.normalize("NFKC", text).casefold().strip(_EDGE_PUNCT)
+    if label == "Language":
+        key = _LEVEL_RE.sub(" ", _BRACKETS_RE.sub(" ", key))
+        key = key.replace("—", " ").replace("–", " ").strip(_EDGE_PUNCT)
+    else:
+        key = _VERSION_RE.sub("", key)
+    return _SEPARATORS_RE.sub("", key)
+
+
+class CanonicalIndex:
+    """{label: {key: canonical id}} plus {label: {id: display name}}."""
+
+    def __init__(self, keys: Dict[str, Dict[str, str]], names: Dict[str, Dict[str, str]]):
+        self.keys = keys
+        self.names = names
+
+    def lookup(self, label: str, text: str) -> Tuple[str, str]:
+        """(canonical id, display name); unknown terms get their own key as id and their text as name."""
+        key = normalize(label, text)
+        cid = self.keys.get(label, {}).get(key)
+        if cid is None:
+            return key, text.strip()
+        return cid, self.names[label][cid]
+
+    def to_dict(self) -> Dict:
+        return {"keys": self.keys, "names": self.names}
+
+    def save(self, path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=1, sort_keys=True),
+                              encoding="utf-8")
+
+    @classmethod
+    def load(cls, path) -> "CanonicalIndex":
+        d = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(d["keys"], d["names"])
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {label: {"ids": len(self.names[label]), "keys": len(self.keys[label])} for label in self.names}
+
+
+def _dictionary_languages(patterns: Iterable[str]) -> List[str]:
+    """Language names in the LANGUAGE_TERMS regexes (capitalised words that are not levels)."""
+    words = re.findall(r"[A-Z][a-z]+", " ".join(patterns))
+    return [w for w in dict.fromkeys(words) if w.lower() not in LEVEL_WORDS]
+
+def build_index(annotated: Iterable[Tuple[str, str]] = ()) -> CanonicalIndex:
+    """
+    Index the dictionaries, then annotated (label, text) pairs.
+
+    A dictionary pattern is one id. Its first variant (all optional parts
+    present: "React.js", "CNNs") is the display name, and every variant is a
+    key. Annotated texts whose key is still unknown become ids of their own,
+    named after their most frequent spelling.
+    """
+    keys: Dict[str, Dict[str, str]] = {label: {} for label in CANONICAL_LABELS}
+    names: Dict[str, Dict[str, str]] = {label: {} for label in CANONICAL_LABELS}
+
+    def add(label: str, name: str, variants: Iterable[str]) -> None:
+        cid = normalize(label, name)
+        if not cid or cid in keys[label]:  # a variant of an earlier term already claims it
+            return
+        names[label][cid] = name
+        for v in variants:
+            keys[label].setdefault(normalize(label, v), cid)
+
+    for pattern in dict.fromkeys(SKILL_TERMS):
+        variants = expand_term(pattern)
+        if variants:  # patterns needing a real regex (\s+, classes) have no fixed spelling
+            add("Skill", variants[0], variants)
+    for name in _dictionary_languages(LANGUAGE_TERMS):
+        add("Language", name, [name])
+
+    spellings: Dict[Tuple[str, str], Counter] = {}
+    for label, text in annotated:
+        if label not in keys:
+            continue
+        key = normalize(label, text)
+        if key and key not in keys[label]:
+            spellings.setdefault((label, key), Counter())[text.strip()] += 1
+    for (label, key), counts in sorted(spellings.items()):
+        name = counts.most_common(1)[0][0]
+        if label == "Language":  # "Ukrainian (native)" -> "Ukrainian"
+            name = _BRACKETS_RE.sub(" ", name)
+            name = " ".join(w for w in re.split(r"[\s—–-]+", name) if w and not _LEVEL_RE.fullmatch(w.lower()))
+            name = name.title() or key
+        names[label][key] = name
+        keys[label][key] = key
+    return CanonicalIndex(keys, names)
+
+def load_or_build(path: Optional[Path]) -> CanonicalIndex:
+    if path is not None and Path(path).is_file():
+        return CanonicalIndex.load(path)
+    return build_index()
+
+def index_version(path: Optional[Path]) -> str:
+    """Short content hash of the index file ("builtin" without one), for cache versioning."""
+    try:
+        return hashlib.sha1(Path(path).read_bytes()).hexdigest()[:10]
+    except (OSError, TypeError):
+        return "builtin"
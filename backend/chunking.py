@@ -0,0 +1,78 @@
+"""
+Chunked NER for long documents.
+
+The text is split into overlapping windows, preferably at paragraph breaks,
+then line breaks, then spaces. The windows are run through the pipeline and
+their entities are mapped back to offsets in the whole text.
+
+Every overlap has a seam at its midpoint. An entity is kept from the window
+on the side of the seam where it starts, so an entity seen by both windows
+is counted once. The window that keeps it has at least overlap/2 characters
+of context around the seam. The overlap should therefore be at least twice
+the longest expected entity.
+"""
+import re
+from typing import Iterable, List, Sequence, Tuple
+
+# (start, end, label) in characters
+Ent = Tuple[int, int, str]
+
+WINDOW_BREAKS = (re.compile(r"\n[ \t]*\n\s*"), re.compile(r"\n\s*"), re.compile(r"\s+"))
+
+
+def _last_break(text: str, lo: int, hi: int) -> int:
+    """End of the last paragraph/line/word break in text[lo:hi], or hi if there is none."""
+    for pattern in WINDOW_BREAKS:
+        last = None
+        for last in pattern.finditer(text, lo, hi):
+            pass
+        if last is not None:
+            return last.end()
+    return hi
+
+def _first_break(text: str, lo: int, hi: int) -> int:
+    """Start of the first line/word after lo (before hi), or lo if there is none."""
+    for pattern in WINDOW_BREAKS[1:]:
+        m = pattern.search(text, lo, hi)
+        if m is not None:
+            return m.end()
+    return lo
+
+def split_windows(text: str, max_chars: int, overlap: int) -> List[Tuple[int, int]]:
+    """(start, end) windows of at most max_chars covering text, each overlapping the next."""
+    n = len(text)
+    if n <= max_chars:
+        return [(0, n)]
+    overlap = min(overlap, max_chars // 4)
+    windows: List[Tuple[int, int]] = []
+    start = 0
+    while start + max_chars < n:
+        # end at a break in the second half of the window, so windows stay large
+        end = _last_break(text, start + max_chars // 2, start + max_chars)
+        windows.append((start, end))
+        start = _first_break(text, end - overlap, end)
+    windows.append((start, n))
+    return windows
+
+def stitch(windows: Sequence[Tuple[int, int]], window_ents: Iterable[Iterable[Ent]]) -> List[Ent]:
+    """Merge per-window entities (offsets relative to their window) into whole-text entities."""
+    seams = [(prev_end + next_start) // 2 for (_, prev_end), (next_start, _) in zip(windows, windows[1:])]
+    merged: List[Ent] = []
+    for i, ((offset, _), ents) in enumerate(zip(windows, window_ents)):
+        lo = seams[i - 1] if i > 0 else 0
+        hi = seams[i] if i < len(seams) else None
+        for start, end, label in ents:
+            start += offset
+            if start < lo or (hi is not None and start >= hi):
+                continue
+            merged.append((start, end + offset, label))
+    # an entity kept just before a seam can still cross one kept just after it
+    merged.sort()
+    out: List[Ent] = []
+    for ent in merged:
+        if out and ent[0] < out[-1][1]:
+            if ent[1] - ent[0] > out[-1][1] - out[-1][0]:
+                out[-1] = ent
+            continue
+        out.append(ent)
+    return out
@@ -0,0 +1,98 @@
+"""
+Text normalisation shared by the API and the training scripts.
+
+clean_text gives exactly the result of the original chain of passes
+
+    s = s.replace("\r\n", "\n").replace("\r", "\n")
+    s = CID.sub(" ", s)
+    s = re.sub(r"([a-z])\n([a-z])", r"\1 \2", s, flags=re.I)
+    s = re.sub(r"[ \t]+", " ", s)
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    s = s.strip()
+
+but with precompiled patterns that the regex engine can scan quickly: passes
+that cannot change anything are skipped with a substring check, the line
+join starts its search at the newline instead of at every letter, and the
+whitespace pass only matches runs that actually change (not every single
+space). Layout-extracted PDF text is mostly padding, so this is where the
+time went.
+
+With offsets=True a single-scan variant also returns, for every character of
+the cleaned text, its index in the input, so entity offsets can be mapped
+back to the raw extracted text.
+"""
+import re
+from typing import List, Tuple, Union
+
+_LETTER = r"(?i:[a-z])"
+_NL = r"(?:\r\n|\r|\n)"
+_CID = r"\(cid:\d+\)"
+
+CID_RE = re.compile(_CID)
+# "Machine\nLearning" -> "Machine Learning"
+JOIN_RE = re.compile(rf"\n(?<={_LETTER}\n)(?={_LETTER})")
+# "a\nb\nc": the original pass consumes "b" when joining the first break, so
+# the second one stays. Texts with such a chain take the sequential pattern.
+JOIN_CHAIN_RE = re.compile(rf"\n(?<={_LETTER}\n)(?={_LETTER}\n{_LETTER})")
+JOIN_SEQUENTIAL_RE = re.compile(r"([a-z])\n([a-z])", re.I)
+SPACES_RE = re.compile(r"[ \t]{2,}|\t")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Everything above in one pattern, for the offsets variant.
+CLEAN_RE = re.compile(
+    rf"(?P<blank>{_NL}{{3,}})"
+    rf"|(?P<join>(?<={_LETTER}){_NL}(?={_LETTER}))"
+    r"|(?P<cr>\r\n?)"
+    rf"|(?P<space> ?(?:\t|  |{_CID})(?:[ \t]|{_CID})*)"
+)
+REPLACEMENTS = {"blank": "\n\n", "cr": "\n", "space": " "}
+
+
+def clean_text(s: str, offsets: bool = False) -> Union[str, Tuple[str, List[int]]]:
+    if offsets:
+        return _clean_with_offsets(s)
+    if not s:
+        return ""
+    if "\r" in s:
+        s = s.replace("\r\n", "\n").replace("\r", "\n")
+    if "(cid:" in s:
+        s = CID_RE.sub(" ", s)
+    if JOIN_CHAIN_RE.search(s):
+        s = JOIN_SEQUENTIAL_RE.sub(r"\1 \2", s)
+    else:
+        s = JOIN_RE.sub(" ", s)
+    s = SPACES_RE.sub(" ", s)
+    s = BLANK_LINES_RE.sub("\n\n", s)
+    return s.strip()
+
+def _clean_with_offsets(s: str) -> Tuple[str, List[int]]:
+    if not s:
+        return "", []
+
+    parts: List[str] = []
+    index: List[int] = []
+    pos = 0
+    joined_at = -2  # index of the letter consumed by the previous join
+    for m in CLEAN_RE.finditer(s):
+        start, end = m.span()
+        kind = m.lastgroup
+        if kind == "join":
+            if start - 1 == joined_at:
+                rep = "\n"
+            else:
+                rep = " "
+                joined_at = end
+        else:
+            rep = REPLACEMENTS[kind]
+        parts.append(s[pos:start])
+        parts.append(rep)
+        index.extend(range(pos, start))
+        index.extend([start] * len(rep))
+        pos = end
+    parts.append(s[pos:])
+    index.extend(range(pos, len(s)))
+    text = "".join(parts)
+
+    stripped = text.strip()
+    lead = len(text) - len(text.lstrip())
+    return stripped, index[lead:lead + len(stripped)]
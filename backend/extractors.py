@@ -0,0 +1,319 @@
+"""
+Text extraction from uploaded files.
+
+PDFs go through a pluggable engine:
+  - "layout": pdfplumber with layout=True; highest fidelity, slowest.
+  - "fast":   pdfminer's text converter without advanced layout analysis
+              (boxes_flow=None); lines stay intact but columns are not
+              reconstructed.
+  - "auto":   picks one of the above from cheap file heuristics.
+Both engines yield pages one at a time and run under the same per-document
+page/time/memory budgets.
+
+The file type is taken from the content (magic bytes), not the filename.
+Plain text has no magic bytes, so it is only accepted from a .txt file, or
+from one without a suffix whose content reads as text (not markup or RTF).
+pdfplumber and pdfminer are imported when the first PDF arrives, so
+processes that never see one (or have not yet) skip that import cost.
+"""
+import codecs
+import io
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import psutil  # optional: current RSS where /proc is not available (macOS, Windows)
+except ImportError:
+    psutil = None
+
+SNIFF_BYTES = 2048
+TEXT_MAX_CONTROL = 0.01  # share of control characters allowed in the head of a plain-text upload
+MARKUP_STARTS = ("<!doctype", "<html", "<?xml", "<svg", "{\\rtf")  # text, but not a resume to parse
+
+# Per-document PDF budgets; extraction stops (keeping the pages read so far)
+# once any of them is exceeded.
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "20"))
+PDF_TIME_BUDGET_S = float(os.getenv("PDF_TIME_BUDGET_S", "10"))
+PDF_MEMORY_BUDGET_MB = int(os.getenv("PDF_MEMORY_BUDGET_MB", "512"))
+
+# Engine used when a request does not ask for one: "layout", "fast" or "auto".
+PDF_ENGINE = os.getenv("PDF_ENGINE", "layout")
+# "auto" keeps the layout engine for short, small documents (typical one- or
+# two-page CVs, where it is cheap and its column handling pays off) and
+# switches to the fast engine beyond these limits.
+AUTO_LAYOUT_MAX_PAGES = 3
+AUTO_LAYOUT_MAX_BYTES = 2 * 1024 * 1024
+
+
+class UnsupportedFileType(ValueError):
+    pass
+
+
+@dataclass
+class PdfPage:
+    number: int
+    text: str
+    seconds: float
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process; 0 where it cannot be read (the memory budget is then off)."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    return 0.0
+
+
+class PdfBudget:
+    """
+    Per-document limits, checked by the engines before each page.
+
+    The memory limit applies to growth of the process's current RSS while
+    this document is being read. The peak RSS (ru_maxrss) would not do: once
+    one large document has set it, later ones barely move it.
+    """
+
+    def __init__(self, max_pages: int = PDF_MAX_PAGES, time_budget_s: float = PDF_TIME_BUDGET_S,
+                 memory_budget_mb: int = PDF_MEMORY_BUDGET_MB):
+        self.max_pages = max_pages
+        self.time_budget_s = time_budget_s
+        self.memory_budget_mb = memory_budget_mb
+        self.started = time.perf_counter()
+        self.rss_start = _rss_mb()
+        self.truncated: Optional[str] = None
+
+    def exceeded(self, pages_done: int) -> bool:
+        if pages_done >= self.max_pages:
+            self.truncated = "max_pages"
+        elif time.perf_counter() - self.started > self.time_budget_s:
+            self.truncated = "time_budget"
+        elif _rss_mb() - self.rss_start > self.memory_budget_mb:
+            self.truncated = "memory_budget"
+        return self.truncated is not None
+
+
+def _reads_as_text(head: bytes) -> bool:
+    """UTF-8 or cp1252 with few control characters, and not HTML, XML, SVG or RTF."""
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            # incremental: the head may end inside a multi-byte character
+            text = codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        return False
+    if text.lstrip("\ufeff \t\r\n")[:16].lower().startswith(MARKUP_STARTS):
+        return False
+    control = sum(1 for c in text if ord(c) < 32 and c not in "\t\n\r\f")
+    return control <= len(text) * TEXT_MAX_CONTROL
+
+def sniff_type(head: bytes, filename: Optional[str] = None) -> Optional[str]:
+    """
+    ".pdf", ".docx" or ".txt" judged from the first bytes of a file; None if
+    it is none of them. A PDF header must open the file; only a .pdf may have
+    junk before it, so a text resume quoting "%PDF-" stays text. Text must come from a .txt file, or from one without
+    a suffix (or a name) that reads as text; anything else, like .html, .rtf
+    or .csv, is turned away as the extension allowlist used to.
+    """
+    suffix = Path(filename or "").suffix.lower()
+    if head.lstrip(b"\xef\xbb\xbf \t\r\n")[:5] == b"%PDF-":
+        return ".pdf"
+    if suffix == ".pdf" and b"%PDF-" in head[:1024]:  # the spec allows junk before the header
+        return ".pdf"
+    if head.startswith(b"PK\x03\x04"):  # zip container; read_docx rejects non-Word zips
+        return ".docx"
+    if b"\x00" in head:
+        return None
+    if suffix == ".txt":
+        return ".txt"
+    if not suffix and _reads_as_text(head):
+        return ".txt"
+    return None
+
+def unsupported_message(filename: Optional[str]) -> str:
+    suffix = Path(filename or "").suffix.lower() or "unknown"
+    return f"Unsupported file type: {suffix} (expected PDF, DOCX or plain text)"
+
+def read_txt(bytes_data: bytes) -> str:
+    return bytes_data.decode("utf-8", errors="ignore")
+
+# ---------- DOCX ----------
+# Same output as docx2txt.process (headers, body, footers; w:p starts a blank
+# line, w:tab/w:br/w:cr map to tab/newline), but read straight from the
+# upload bytes: each XML part is decompressed and parsed incrementally, and
+# elements are cleared as soon as their text is taken.
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_T, W_TAB, W_P = W_NS + "t", W_NS + "tab", W_NS + "p"
+W_BREAKS = (W_NS + "br", W_NS + "cr")
+DOCX_HEADER = re.compile(r"word/header[0-9]*.xml")
+DOCX_FOOTER = re.compile(r"word/footer[0-9]*.xml")
+
+def _docx_part_text(zipf: zipfile.ZipFile, name: str, parts: List[str]) -> None:
+    with zipf.open(name) as fh:
+        for event, elem in ET.iterparse(fh, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == W_P:
+                    parts.append("\n\n")
+                elif tag == W_TAB:
+                    parts.append("\t")
+                elif tag in W_BREAKS:
+                    parts.append("\n")
+            else:
+                # w:t has no child elements, so its text is complete at "end"
+                if tag == W_T and elem.text:
+                    parts.append(elem.text)
+                elem.clear()
+
+def read_docx(bytes_data: bytes) -> str:
+    parts: List[str] = []
+    with zipfile.ZipFile(io.BytesIO(bytes_data)) as zipf:
+        names = zipf.namelist()
+        for name in names:
+            if DOCX_HEADER.match(name):
+                _docx_part_text(zipf, name, parts)
+        _docx_part_text(zipf, "word/document.xml", parts)
+        for name in names:
+            if DOCX_FOOTER.match(name):
+                _docx_part_text(zipf, name, parts)
+    return "".join(parts).strip()
+
+
+# ---------- PDF engines ----------
+class PdfEngine:
+    name = ""
+
+    def iter_pages(self, bytes_data: bytes, budget: PdfBudget) -> Iterator[PdfPage]:
+        raise NotImplementedError
+
+
+class LayoutEngine(PdfEngine):
+    name = "layout"
+
+    def iter_pages(self, bytes_data: bytes, budget: PdfBudget) -> Iterator[PdfPage]:
+        import pdfplumber
+        from pdfminer.pdfpage import PDFPage
+        from pdfplumber.page import Page
+
+        # Pages are created one at a time (pdf.pages would build them all up
+        # front) and their parsed objects are dropped once the text is out.
+        with io.BytesIO(bytes_data) as bio:
+            with pdfplumber.open(bio) as pdf:
+                doctop = 0
+                for i, page_obj in enumerate(PDFPage.create_pages(pdf.doc)):
+                    if budget.exceeded(i):
+                        break
+                    t0 = time.perf_counter()
+                    page = Page(pdf, page_obj, page_number=i + 1, initial_doctop=doctop)
+                    doctop += page.height
+                    text = page.extract_text(x_tolerance=1, y_tolerance=1, layout=True) or ""
+                    page.flush_cache()
+                    page.get_textmap.cache_clear()
+                    del page
+                    yield PdfPage(i + 1, text, time.perf_counter() - t0)
+
+
+class FastEngine(PdfEngine):
+    name = "fast"
+
+    def iter_pages(self, bytes_data: bytes, budget: PdfBudget) -> Iterator[PdfPage]:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        with io.BytesIO(bytes_data) as bio:
+            doc = PDFDocument(PDFParser(bio))
+            rsrcmgr = PDFResourceManager(caching=True)
+            out = io.StringIO()
+            device = TextConverter(rsrcmgr, out, laparams=LAParams(boxes_flow=None))
+            interpreter = PDFPageInterpreter(rsrcmgr, device)
+            try:
+                for i, page_obj in enumerate(PDFPage.create_pages(doc)):
+                    if budget.exceeded(i):
+                        break
+                    t0 = time.perf_counter()
+                    interpreter.process_page(page_obj)
+                    text = out.getvalue().replace("\f", "")
+                    out.seek(0)
+                    out.truncate(0)
+                    yield PdfPage(i + 1, text, time.perf_counter() - t0)
+            finally:
+                device.close()
+
+
+PDF_ENGINES: Dict[str, PdfEngine] = {e.name: e for e in (LayoutEngine(), FastEngine())}
+ENGINE_CHOICES = set(PDF_ENGINES) | {"auto"}
+
+def pdf_page_count(bytes_data: bytes) -> int:
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    with io.BytesIO(bytes_data) as bio:
+        doc = PDFDocument(PDFParser(bio))
+        pages = resolve1(doc.catalog.get("Pages"))
+        return int(resolve1(pages.get("Count", 0))) if isinstance(pages, dict) else 0
+
+def choose_engine(bytes_data: bytes, engine: Optional[str] = None) -> PdfEngine:
+    name = engine or PDF_ENGINE
+    if name != "auto":
+        return PDF_ENGINES[name]
+    if len(bytes_data) > AUTO_LAYOUT_MAX_BYTES:
+        return PDF_ENGINES["fast"]
+    try:
+        pages = pdf_page_count(bytes_data)
+    except Exception:
+        pages = 0
+    return PDF_ENGINES["fast" if pages > AUTO_LAYOUT_MAX_PAGES else "layout"]
+
+
+def iter_pdf_pages(bytes_data: bytes, stats: Optional[Dict] = None, engine: Optional[str] = None,
+                   budget: Optional[PdfBudget] = None) -> Iterator[PdfPage]:
+    """
+    Yield the text of each page as the chosen engine extracts it.
+
+    Extraction stops at the first exceeded budget, keeping the pages read so
+    far; stats["truncated"] records which budget was hit.
+    """
+    pdf_engine = choose_engine(bytes_data, engine)
+    budget = budget or PdfBudget()
+    if stats is not None:
+        stats["engine"] = pdf_engine.name
+    yield from pdf_engine.iter_pages(bytes_data, budget)
+    if stats is not None and budget.truncated:
+        stats["truncated"] = budget.truncated
+
+def read_pdf(bytes_data: bytes, stats: Optional[Dict] = None, engine: Optional[str] = None) -> str:
+    text_parts: List[str] = []
+    page_stats: List[Dict] = []
+    for page in iter_pdf_pages(bytes_data, stats, engine):
+        text_parts.append(page.text)
+        page_stats.append({"page": page.number, "chars": len(page.text), "ms": round(page.seconds * 1000, 1)})
+    if stats is not None:
+        stats["pages"] = page_stats
+    return "\n".join(text_parts)
+
+def extract_text(filename: Optional[str], raw: bytes, stats: Optional[Dict] = None,
+                 engine: Optional[str] = None) -> str:
+    kind = sniff_type(raw[:SNIFF_BYTES], filename)
+    if kind is None:
+        raise UnsupportedFileType(unsupported_message(filename))
+    if kind == ".txt":
+        return read_txt(raw)
+    if kind == ".docx":
+        return read_docx(raw)
+    return read_pdf(raw, stats, engine)
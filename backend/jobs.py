@@ -0,0 +1,335 @@
+"""
+Asynchronous parse jobs.
+
+POST /jobs stores the upload and returns a job id at once. Background
+runners take jobs off an in-process queue and hand them to a handler. The
+API's handler parses through the same WorkerPool as /parse, so jobs and
+synchronous requests share one CPU budget. Clients poll GET /jobs/{id}, or
+long-poll it with ?wait=<seconds>.
+
+Job records are kept in memory, and an upload only until its job has run.
+The queue is bounded by the number of waiting jobs and by the bytes of the
+uploads it holds. Finished jobs are dropped after ttl_s, by a timer.
+
+With a SQLite file configured, jobs are also written there (off the event
+loop): queued jobs survive a restart, and finished jobs can still be read.
+Several processes may share the file. Each row carries a lease held by the
+process that accepted or claimed it, renewed every MAINTAIN_S while it
+lives; a process only takes over queued or running jobs whose lease has
+expired, so a job is not run twice by two live workers.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from pipeline import ParseError
+from workers import QueueFull
+
+POOL_RETRY_S = 0.2  # pause before retrying a job the worker pool had no room for
+MAINTAIN_S = 10     # how often leases are renewed, expired jobs pruned and orphaned jobs claimed
+LEASE_S = 60        # a job whose owner has not renewed its lease for this long is taken over
+
+FINISHED = ("done", "failed")
+
+
+@dataclass
+class Job:
+    id: str
+    filename: Optional[str]
+    engine: str
+    status: str = "queued"  # queued -> running -> done | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    timings: Dict = field(default_factory=dict)
+    result: Optional[Dict] = None
+    error: Optional[Dict] = None
+    raw: Optional[bytes] = field(default=None, repr=False)  # dropped once the job has run
+
+    def to_dict(self) -> Dict:
+        out = {
+            "id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "engine": self.engine,
+            "created_at": round(self.created_at, 3),
+            "timings": self.timings,
+        }
+        if self.result is not None:
+            out["result"] = self.result
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+
+# handler(job) -> (parse_resume payload, stage timings in ms)
+Handler = Callable[[Job], Awaitable[Tuple[Dict, Dict]]]
+# on_finish(job), once a job has run, whatever its outcome
+FinishHook = Callable[[Job], Awaitable[None]]
+
+
+class JobQueue:
+    def __init__(self, handler: Handler, runners: int, max_queued: int, db_path: Optional[str] = None,
+                 ttl_s: float = 3600, max_queued_bytes: int = 0, on_finish: Optional[FinishHook] = None):
+        self.handler = handler
+        self.on_finish = on_finish
+        self.runners = max(1, runners)
+        self.max_queued = max_queued
+        self.max_queued_bytes = max_queued_bytes  # 0 = no byte limit
+        self.ttl_s = ttl_s
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, Job] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL,"
+                " finished_at REAL, record TEXT NOT NULL, raw BLOB, owner TEXT, lease_until REAL)"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):  # files from before leases
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._db.commit()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()  # jobs left by other processes are claimed by _maintain's first round
+        self._tasks = [asyncio.create_task(self._runner()) for _ in range(self.runners)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    # ---------- API ----------
+    async def submit(self, filename: Optional[str], raw: bytes, engine: str) -> Job:
+        queued = sum(1 for j in self._jobs.values() if j.status == "queued")
+        if queued >= self.max_queued:
+            self.rejected += 1
+            raise QueueFull(f"Job queue is full ({queued} jobs waiting). Try again shortly.")
+        held = self.held_bytes()
+        if self.max_queued_bytes and held and held + len(raw) > self.max_queued_bytes:
+            self.rejected += 1
+            raise QueueFull(f"Job queue is full ({held / 2**20:.1f} MB of uploads waiting). Try again shortly.")
+        job = Job(id=uuid.uuid4().hex, filename=filename, engine=engine, raw=raw)
+        self._track(job)  # counted against the limits before the first await
+        try:
+            await self._persist(job)
+        except Exception:
+            self._jobs.pop(job.id, None)
+            self._events.pop(job.id, None)
+            raise
+        self.submitted += 1
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        self._prune_memory()
+        job = self._jobs.get(job_id)
+        if job is None and self._db is not None:
+            job = await asyncio.to_thread(self._load, job_id)
+        return job
+
+    def held_bytes(self) -> int:
+        """Bytes of the uploads held for jobs that have not run yet."""
+        return sum(len(j.raw) for j in self._jobs.values() if j.raw is not None)
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Return once the job has finished or timeout seconds have passed."""
+        event = self._events.get(job.id)
+        if timeout > 0 and event is not None and job.status not in FINISHED:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def stats(self) -> Dict:
+        by_status = {s: 0 for s in ("queued", "running", *FINISHED)}
+        for job in self._jobs.values():
+            by_status[job.status] += 1
+        return {
+            "states": by_status,
+            "max_queued": self.max_queued,
+            "held_bytes": self.held_bytes(),
+            "max_queued_bytes": self.max_queued_bytes,
+            "runners": self.runners,
+            "persistent": self._db is not None,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    # ---------- runners ----------
+    async def _runner(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == "queued":
+                try:
+                    await self._execute(job)
+                except Exception:  # one job's bookkeeping failing must not stop the runner
+                    pass
+
+    async def _execute(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            await self._persist(job)
+        except sqlite3.Error:  # the row stays queued under this process's lease; the final save catches up
+            pass
+        try:
+            while True:
+                try:
+                    job.result, stage_ms = await self.handler(job)
+                    break
+                except QueueFull:
+                    await asyncio.sleep(POOL_RETRY_S)
+            job.status = "done"
+            self.completed += 1
+        except ParseError as e:
+            job.status, job.error, stage_ms = "failed", {"status_code": e.status_code, "detail": e.detail}, {}
+            self.failed += 1
+        except Exception as e:
+            job.status, job.error, stage_ms = "failed", {"status_code": 500, "detail": f"Parsing failed: {e}"}, {}
+            self.failed += 1
+        job.finished_at = time.time()
+        job.raw = None
+        job.timings = {
+            "queue_ms": round((job.started_at - job.created_at) * 1000, 1),
+            **stage_ms,
+            "total_ms": round((job.finished_at - job.created_at) * 1000, 1),
+        }
+        try:
+            await self._persist(job)
+        except Exception:  # the result is still served from memory
+            pass
+        event = self._events.pop(job.id, None)
+        if event is not None:
+            event.set()
+        if self.on_finish is not None:
+            await self.on_finish(job)
+
+    async def _maintain(self) -> None:
+        """Every MAINTAIN_S, starting at once: prune, renew leases and claim orphaned jobs."""
+        while True:
+            self._prune_memory()
+            if self._db is not None:
+                try:
+                    self._enqueue(await asyncio.to_thread(self._housekeep))
+                except sqlite3.Error:  # locked by another process; next round
+                    pass
+            await asyncio.sleep(MAINTAIN_S)
+
+    # ---------- bookkeeping ----------
+    def _track(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        if job.status not in FINISHED:
+            self._events[job.id] = asyncio.Event()
+
+    def _enqueue(self, recovered) -> None:
+        for job in recovered:
+            if job.id not in self._jobs:
+                self._track(job)
+                self._queue.put_nowait(job.id)
+
+    def _prune_memory(self) -> None:
+        cutoff = time.time() - self.ttl_s
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at is not None and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _housekeep(self):
+        """Renew this process's leases, drop expired rows and claim orphaned jobs (runs in a thread)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND finished_at IS NULL",
+                             (now + LEASE_S, self.owner))
+            self._db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (now - self.ttl_s,))
+            self._db.commit()
+        return self._recover()
+
+    async def _persist(self, job: Job) -> None:
+        if self._db is not None:
+            await asyncio.to_thread(self._save, job)
+
+    def _save(self, job: Job) -> None:
+        record = json.dumps({
+            **job.to_dict(),
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }, ensure_ascii=False)
+        lease_until = None if job.status in FINISHED else time.time() + LEASE_S
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, created_at, finished_at, record, raw, owner, lease_until)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, job.created_at, job.finished_at, record, job.raw, self.owner, lease_until),
+            )
+            self._db.commit()
+
+    def _from_row(self, record: str, raw: Optional[bytes]) -> Job:
+        d = json.loads(record)
+        return Job(
+            id=d["id"], filename=d["filename"], engine=d["engine"], status=d["status"],
+            created_at=d["created_at"], started_at=d.get("started_at"), finished_at=d.get("finished_at"),
+            timings=d.get("timings", {}), result=d.get("result"), error=d.get("error"), raw=raw,
+        )
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else self._from_row(row[0], None)
+
+    def _recover(self):
+        """
+        Jobs another process accepted but did not finish, and whose lease has
+        expired, oldest first. They are claimed for this process in one UPDATE,
+        so two processes never take the same job.
+        """
+        if self._db is None:
+            return []
+        now = time.time()
+        token = f"{self.owner}:claim-{uuid.uuid4().hex[:8]}"  # marks this round's rows
+        with self._lock:
+            claim = self._db.execute(
+                "UPDATE jobs SET owner = ?, lease_until = ? WHERE status IN ('queued', 'running')"
+                " AND (owner IS NULL OR owner != ?) AND (lease_until IS NULL OR lease_until < ?)",
+                (token, now + LEASE_S, self.owner, now),
+            )
+            if not claim.rowcount:
+                self._db.commit()
+                return []
+            rows = self._db.execute(
+                "SELECT record, raw FROM jobs WHERE owner = ? ORDER BY created_at", (token,)
+            ).fetchall()
+            self._db.execute("UPDATE jobs SET owner = ? WHERE owner = ?", (self.owner, token))
+            self._db.commit()
+        jobs = []
+        for record, raw in rows:
+            job = self._from_row(record, raw)
+            job.status, job.started_at = "queued", None
+            jobs.append(job)
+        return jobs
@@ -1,25 +1,153 @@
-import io
+import time
+
+STARTED = time.perf_counter()
+
+import asyncio
+import hmac
+import itertools
 import os
-import re
-import tempfile
+import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple, Union
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import Depends, FastAPI, File, Header, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+# Sibling modules are imported by name both for `uvicorn main:app` (run from
+# backend/) and for `backend.main` (Vercel); worker processes rely on the same.
+sys.path.insert(0, str(Path(__file__).parent))
+
+import metrics
+import pipeline
+from admission import AdmissionControl, AdmissionMiddleware, Rejected, Ticket, estimate_cost
+from archives import open_archive
+from cache import ResultCache
+from canonical import index_version
+from extractors import ENGINE_CHOICES, PDF_ENGINE, SNIFF_BYTES, sniff_type
+from jobs import POOL_RETRY_S, Job, JobQueue
+from models import ModelRegistry, ModelSlot
+from pipeline import ParseError
+from responses import FastJSONResponse, dumps, shape_result, stream_batch
+from uploads import MB, MULTIPART_OVERHEAD, UploadLimitMiddleware, detach_upload, read_upload
+from workers import QueueFull, WorkerPool
 
-import spacy
-import pdfplumber
-import docx2txt
+IMPORT_MS = round((time.perf_counter() - STARTED) * 1000, 1)
 
 # ---------- Config ----------
-MODEL_DIR = Path(__file__).parent / "model"   # <- relative path inside repo
+# Serving tiers: "accurate" is the trained model, "fast" a distilled student (training/distill_ner.py).
+MODEL_TIERS = {
+    "accurate": Path(os.getenv("ACCURATE_MODEL_DIR", Path(__file__).parent / "model")),   # <- relative path inside repo
+    "fast": Path(os.getenv("FAST_MODEL_DIR", Path(__file__).parent / "model_fast")),
+}
+MODEL_TIER = os.getenv("MODEL_TIER", "accurate")
+if MODEL_TIER not in MODEL_TIERS:
+    raise RuntimeError(f"Unknown MODEL_TIER: {MODEL_TIER}. Choose one of {sorted(MODEL_TIERS)}.")
+MODEL_DIR = MODEL_TIERS[MODEL_TIER].resolve()  # resolved: the pipeline and the registry compare model paths
 MAX_FILE_SIZE_MB = 10
-ALLOWED_EXT = {".pdf", ".docx", ".txt"}
+MAX_BATCH_FILES = 100
+MAX_BATCH_SIZE_MB = 100
+MAX_ARCHIVE_SIZE_MB = int(os.getenv("MAX_ARCHIVE_SIZE_MB", "500"))
+MAX_ARCHIVE_FILES = int(os.getenv("MAX_ARCHIVE_FILES", "2000"))
+ARCHIVE_WINDOW = int(os.getenv("ARCHIVE_WINDOW", "16"))  # archive members parsed per batch
+MAX_JOB_FILE_SIZE_MB = int(os.getenv("MAX_JOB_FILE_SIZE_MB", "50"))  # async jobs take larger files than /parse
+NLP_BATCH_SIZE = 32
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))        # 0 = run in a thread of this process
+PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", "32"))  # jobs allowed to wait for a worker
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))  # in-memory LRU entries
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB")                  # optional SQLite file for a persistent tier
+RESULT_CACHE_DB_SIZE = int(os.getenv("RESULT_CACHE_DB_SIZE", "50000"))  # rows kept in that file (0 = no cap)
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "1000"))  # queued jobs before POST /jobs answers 503
+JOB_QUEUE_MB = int(os.getenv("JOB_QUEUE_MB", "512"))       # upload bytes held for unrun jobs before 503 (0 = no cap)
+JOBS_DB = os.getenv("JOBS_DB")                               # optional SQLite file; queued jobs then survive restarts
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "3600"))           # how long finished jobs can be fetched
+JOB_MAX_WAIT_S = 30                                          # cap on GET /jobs/{id}?wait=
+MODEL_LAZY = os.getenv("MODEL_LAZY", "0") == "1"                # load the model on the first parse, not at import
+MODEL_WATCH_S = float(os.getenv("MODEL_WATCH_S", "0"))          # poll MODEL_DIR and hot-reload on change (0 = off)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")                          # enables /admin/*; sent as the X-Admin-Token header
+# Admission control, in cost units (1 per document or PDF page, plus 1 per MB; see admission.py)
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "0"))      # units/s per tenant (0 = no rate limit)
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "0"))    # bucket size (0 = RATE_LIMIT_RATE, at least 1)
+ADMISSION_CAPACITY = float(os.getenv("ADMISSION_CAPACITY", "0"))  # units parsed at once (0 = unlimited)
+ADMISSION_TENANT_SHARE = float(os.getenv("ADMISSION_TENANT_SHARE", "1"))  # of the capacity, per tenant
+ADMISSION_DB = os.getenv("ADMISSION_DB")                        # optional SQLite file shared by API workers
+API_KEYS = [k.strip() for k in os.getenv("API_KEYS", "").split(",")]  # keys limited on their own (X-API-Key)
+
+# Load spaCy model once at startup (or, with MODEL_LAZY, when the first document needs it)
+if MODEL_LAZY:
+    pipeline.configure(MODEL_DIR)
+else:
+    pipeline.load_model(MODEL_DIR)
+    pipeline.get_term_index()
+
+pool = WorkerPool(PARSE_WORKERS, PARSE_QUEUE_SIZE, str(MODEL_DIR))
+registry = ModelRegistry(pool, MODEL_DIR)
+# The term index and the chunked / section-aware NER settings change results, so they are part of the cache
+# version; the model is part of each key (its ModelSlot.id), as it can change while running.
+CACHE_VERSION = f"r{pipeline.RESULT_SCHEMA}/t{index_version(pipeline.TERM_INDEX)}"
+if pipeline.NER_CHUNK_CHARS > 0:
+    CACHE_VERSION += f"+chunk{pipeline.NER_CHUNK_CHARS}/{pipeline.NER_CHUNK_OVERLAP}"
+if pipeline.NER_SECTIONS:
+    CACHE_VERSION += f"+sections-{','.join(sorted(pipeline.NER_SKIP_SECTIONS))}"
+cache = ResultCache(CACHE_VERSION, RESULT_CACHE_SIZE, RESULT_CACHE_DB, RESULT_CACHE_DB_SIZE)
+admission = AdmissionControl(RATE_LIMIT_RATE, RATE_LIMIT_BURST, ADMISSION_CAPACITY, ADMISSION_TENANT_SHARE,
+                             ADMISSION_DB, API_KEYS)
+
+async def run_job(job: Job):
+    key, slot = route(job.raw, job.engine)
+    result = await cached_result(job.filename, key)
+    if result is not None:
+        return result, {"cached": True}
+    try:
+        result, doc_metrics = await pool.run(pipeline.parse_one, job.filename, job.raw, False, job.engine, slot.model)
+    except ParseError as e:
+        metrics.DOC_ERRORS.inc(status=str(e.status_code))
+        raise
+    observe(doc_metrics, slot)
+    await store_result(key, result)
+    return result, {f"{stage}_ms": ms for stage, ms in doc_metrics["stages_ms"].items()}
+
+# Admission tickets of accepted jobs, held until the job has run so queued jobs count against capacity.
+job_tickets: Dict[str, Ticket] = {}
+
+async def job_finished(job: Job) -> None:
+    ticket = job_tickets.pop(job.id, None)
+    if ticket is not None:
+        await admission.release(ticket)
+
+# One runner per pool slot: jobs keep the workers busy without starving /parse of queue room.
+jobs = JobQueue(run_job, pool.slots, JOB_QUEUE_SIZE, JOBS_DB, JOB_TTL_S, JOB_QUEUE_MB * MB, job_finished)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool.start()
+    jobs.start()
+    watcher = asyncio.create_task(registry.watch(MODEL_WATCH_S)) if MODEL_WATCH_S > 0 else None
+    yield
+    if watcher is not None:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+    await registry.shutdown()
+    await jobs.shutdown()
+    pool.shutdown()
 
-app = FastAPI(title="Resume Parser API", version="1.0.0")
+app = FastAPI(title="Resume Parser API", version="1.0.0", lifespan=lifespan)
 
+# Innermost: oversized uploads get their 413 before they are charged to a tenant.
+app.add_middleware(AdmissionMiddleware, control=admission,
+                   paths=("/parse", "/parse/batch", "/parse/archive", "/jobs"))
+# Added before CORS so its early 413s (and the 429/503s above) still carry CORS headers.
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/parse": MAX_FILE_SIZE_MB * MB + MULTIPART_OVERHEAD,
+        "/parse/batch": MAX_BATCH_SIZE_MB * MB + MULTIPART_OVERHEAD,
+        "/jobs": MAX_JOB_FILE_SIZE_MB * MB + MULTIPART_OVERHEAD,
+        "/parse/archive": MAX_ARCHIVE_SIZE_MB * MB + MULTIPART_OVERHEAD,
+    },
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[os.getenv("FRONTEND_URL", "*")],
@@ -27,109 +155,267 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so early 413s and CORS preflights are counted too.
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Load spaCy model once at startup
-try:
-    nlp = spacy.load(str(MODEL_DIR))
-except Exception as e:
-    raise RuntimeError(f"Failed to load spaCy model from {MODEL_DIR}: {e}")
-
-CID = re.compile(r"\(cid:\d+\)")
-
-def clean_text(s: str) -> str:
-    if not s:
-        return ""
-    s = s.replace("\r\n", "\n").replace("\r", "\n")
-    s = CID.sub(" ", s)
-    s = re.sub(r"([a-z])\n([a-z])", r"\1 \2", s, flags=re.I)
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
-
-def read_txt(bytes_data: bytes) -> str:
-    return bytes_data.decode("utf-8", errors="ignore")
-
-def read_docx(bytes_data: bytes) -> str:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx", dir="/tmp") as tmp:
-        tmp.write(bytes_data)
-        tmp_path = tmp.name
-    try:
-        text = docx2txt.process(tmp_path) or ""
-    finally:
-        try:
-            os.unlink(tmp_path)
-        except Exception:
-            pass
-    return text
-
-def read_pdf(bytes_data: bytes) -> str:
-    text_parts: List[str] = []
-    with io.BytesIO(bytes_data) as bio:
-        with pdfplumber.open(bio) as pdf:
-            for page in pdf.pages:
-                text_parts.append(page.extract_text(x_tolerance=1, y_tolerance=1, layout=True) or "")
-    return "\n".join(text_parts)
-
-def extract_text(file: UploadFile, raw: bytes) -> str:
-    suffix = Path(file.filename or "").suffix.lower()
-    if suffix not in ALLOWED_EXT:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type: {suffix}")
-    if suffix == ".txt":
-        return read_txt(raw)
-    if suffix == ".docx":
-        return read_docx(raw)
-    if suffix == ".pdf":
-        return read_pdf(raw)
-    return ""
-
-def group_entities(doc) -> Dict[str, List[str]]:
-    buckets: Dict[str, List[str]] = {"Skill": [], "Work_Experience": [], "Education": [], "Language": []}
-    for ent in doc.ents:
-        if ent.label_ in buckets:
-            buckets[ent.label_].append(ent.text.strip())
-    # dedupe
-    for k, vals in buckets.items():
-        seen, uniq = set(), []
-        for v in vals:
-            key = v.lower()
-            if key not in seen:
-                seen.add(key)
-                uniq.append(v)
-        buckets[k] = uniq
-    return buckets
+@app.exception_handler(ParseError)
+async def parse_error_handler(request: Request, exc: ParseError):
+    metrics.DOC_ERRORS.inc(status=str(exc.status_code))
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+
+@app.exception_handler(Rejected)
+async def rejected_handler(request: Request, exc: Rejected):
+    return exc.response()
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+def resolve_engine(engine: Optional[str]) -> str:
+    engine = engine or PDF_ENGINE
+    if engine not in ENGINE_CHOICES:
+        raise ParseError(400, f"Unknown PDF engine: {engine}. Choose one of {sorted(ENGINE_CHOICES)}.")
+    return engine
+
+def route(raw: bytes, engine: str) -> Tuple[str, ModelSlot]:
+    """The model that parses these bytes, and the cache key of its result."""
+    digest = cache.digest(raw)
+    slot = registry.route(digest)
+    return cache.key(digest, sniff_type(raw[:SNIFF_BYTES]), engine, slot.id), slot
+
+def observe(doc_metrics: Dict, slot: ModelSlot, upload_ms: Optional[float] = None) -> None:
+    metrics.observe_document(doc_metrics, upload_ms, model=slot.id)
+    slot.observe(doc_metrics)
+
+async def reweigh(request: Request, raws: List[bytes]) -> None:
+    """Re-weigh an admitted request from the files it carried (their type and PDF pages)."""
+    ticket = getattr(request.state, "admission", None)
+    if ticket is not None:
+        # counting PDF pages scans every byte, so it runs off the event loop
+        cost = await run_in_threadpool(lambda: sum(estimate_cost(raw) for raw in raws))
+        await admission.resize(ticket, cost)
+
+async def cached_result(filename: str, key: str):
+    hit = await cache.get(key)
+    return None if hit is None else {"filename": filename, **hit}
+
+async def store_result(key: str, result: Dict) -> None:
+    if "error" not in result:
+        await cache.put(key, {k: v for k, v in result.items() if k not in ("filename", "diagnostics")})
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "model": str(MODEL_DIR), "labels": nlp.pipe_labels.get("ner", [])}
+    return {
+        "status": "ok",
+        "model": str(registry.active.path),
+        "tier": MODEL_TIER,
+        "models": registry.stats(),
+        "labels": pipeline.model_labels(),
+        "model_loaded": pipeline.nlp is not None,
+        "startup": {"import_ms": IMPORT_MS, **pipeline.timings},
+        "pool": pool.stats(),
+        "cache": cache.stats(),
+        "jobs": jobs.stats(),
+        "admission": admission.stats(),
+    }
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return metrics.render()
 
 @app.post("/parse")
-async def parse_resume(file: UploadFile = File(...)):
-    raw = await file.read()
-    size_mb = len(raw) / (1024 * 1024)
-    if size_mb > MAX_FILE_SIZE_MB:
-        raise HTTPException(status_code=413, detail=f"File too large ({size_mb:.1f} MB). Max is {MAX_FILE_SIZE_MB} MB.")
+async def parse_resume(request: Request, file: UploadFile = File(...), diagnostics: bool = False,
+                       engine: Optional[str] = None, include_text: bool = True, offsets: bool = False):
+    """include_text=false leaves out data.text; offsets=true adds data.spans (start, end, label, text)."""
+    engine = resolve_engine(engine)
+    t0 = time.perf_counter()
+    raw = await read_upload(file, MAX_FILE_SIZE_MB * MB)
+    upload_ms = (time.perf_counter() - t0) * 1000
+    await reweigh(request, [raw])
+    key, slot = route(raw, engine)
+    # diagnostics=true always re-runs extraction so the per-page timings are real
+    result = None if diagnostics else await cached_result(file.filename, key)
+    if result is None:
+        result, doc_metrics = await pool.run(pipeline.parse_one, file.filename, raw, diagnostics, engine, slot.model)
+        await store_result(key, result)
+    else:
+        doc_metrics = {"file_type": pipeline.file_type(raw), "stages_ms": {"cache": 0.0}}
+    observe(doc_metrics, slot, upload_ms)
+    return FastJSONResponse(shape_result(result, include_text, offsets), headers={
+        "Server-Timing": metrics.server_timing(doc_metrics, upload_ms),
+        "X-Model": slot.id,
+    })
 
-    try:
-        text = extract_text(file, raw)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read file: {e}")
-
-    text = clean_text(text)
-    if not text or len(text) < 30:
-        raise HTTPException(status_code=400, detail="Resume text appears empty or too short after parsing.")
-
-    doc = nlp(text)
-    grouped = group_entities(doc)
-
-    return JSONResponse(
-        {
-            "filename": file.filename,
-            "length_chars": len(text),
-            "data": {
-                "text": text,
-                "entities": grouped,
-            },
-        }
+async def parse_entries(entries: List[Tuple[str, Union[bytes, ParseError]]], engine: str) -> List[Dict]:
+    """
+    Results for (filename, bytes or the ParseError that stopped reading it) in order.
+    Errors are reported in their slot, cached files are answered directly,
+    and the rest go to one worker as a single batch per model (two while a
+    candidate is being tested).
+    """
+    results: List[Dict] = [{} for _ in entries]
+    batches: Dict[str, Tuple[ModelSlot, List, List[int], List[str]]] = {}
+    for i, (filename, raw) in enumerate(entries):
+        if isinstance(raw, ParseError):
+            metrics.DOC_ERRORS.inc(status=str(raw.status_code))
+            results[i] = pipeline.build_error(filename, raw.status_code, raw.detail)
+            continue
+        key, slot = route(raw, engine)
+        hit = await cached_result(filename, key)
+        if hit is not None:
+            results[i] = hit
+            continue
+        _, items, slots, keys = batches.setdefault(slot.id, (slot, [], [], []))
+        items.append((filename, raw))
+        slots.append(i)
+        keys.append(key)
+
+    # one batch after the other: if the pool turns the second away, the first is already cached
+    for model, items, slots, keys in batches.values():
+        parsed = await pool.run(pipeline.parse_batch, items, NLP_BATCH_SIZE, engine, model.model)
+        for i, key, (res, doc_metrics) in zip(slots, keys, parsed):
+            observe(doc_metrics, model)
+            results[i] = res
+            await store_result(key, res)
+    return results
+
+@app.post("/parse/batch")
+async def parse_resume_batch(request: Request, files: List[UploadFile] = File(...), engine: Optional[str] = None,
+                             include_text: bool = True, offsets: bool = False):
+    engine = resolve_engine(engine)
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=413, detail=f"Too many files ({len(files)}). Max is {MAX_BATCH_FILES} per batch.")
+
+    entries = []
+    for file in files:
+        try:
+            entries.append((file.filename, await read_upload(file, MAX_FILE_SIZE_MB * MB)))
+        except ParseError as e:
+            entries.append((file.filename, e))
+    await reweigh(request, [raw for _, raw in entries if isinstance(raw, bytes)])
+    results = await parse_entries(entries, engine)
+
+    failed = sum(1 for r in results if "error" in r)
+    return stream_batch(
+        {"count": len(files), "parsed": len(files) - failed, "failed": failed},
+        (shape_result(r, include_text, offsets) for r in results),
     )
+
+@app.post("/parse/archive")
+async def parse_archive(file: UploadFile = File(...), engine: Optional[str] = None,
+                        include_text: bool = True, offsets: bool = False):
+    """
+    Parse every file in a ZIP or tar upload, answering with one JSON line per file
+    (same shape as /parse/batch results) as soon as its window is done, then a
+    final {"done": true, "count", "parsed", "failed"} line.
+
+    Members are read ARCHIVE_WINDOW at a time; the next window is read while the
+    previous one is parsed, so at most two windows are held in memory.
+    """
+    engine = resolve_engine(engine)
+    members = open_archive(file.file, MAX_FILE_SIZE_MB * MB, MAX_ARCHIVE_FILES)
+    upload = detach_upload(file)  # read after this function returns
+
+    async def parse_window(window) -> List[Dict]:
+        entries = [(m.name, m.error or m.raw) for m in window]
+        while True:
+            try:
+                return await parse_entries(entries, engine)
+            except QueueFull:
+                await asyncio.sleep(POOL_RETRY_S)
+
+    async def lines():
+        count = failed = 0
+        inflight = None
+        try:
+            while True:
+                window = await run_in_threadpool(lambda: list(itertools.islice(members, ARCHIVE_WINDOW)))
+                task = asyncio.create_task(parse_window(window)) if window else None
+                if inflight is not None:
+                    for result in await inflight:
+                        count += 1
+                        failed += "error" in result
+                        yield dumps(shape_result(result, include_text, offsets)) + b"\n"
+                if task is None:
+                    break
+                inflight = task
+        finally:
+            await run_in_threadpool(upload.close)
+        yield dumps({"done": True, "count": count, "parsed": count - failed, "failed": failed}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request, file: UploadFile = File(...), engine: Optional[str] = None):
+    engine = resolve_engine(engine)
+    raw = await read_upload(file, MAX_JOB_FILE_SIZE_MB * MB)
+    await reweigh(request, [raw])
+    job = await jobs.submit(file.filename, raw, engine)
+    ticket = getattr(request.state, "admission", None)
+    if ticket is not None:  # held until the job has run, then released by job_finished
+        ticket.detached = True
+        job_tickets[job.id] = ticket
+    return FastJSONResponse(job.to_dict(), status_code=202, headers={"Location": f"/jobs/{job.id}"})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0, include_text: bool = True, offsets: bool = False):
+    """
+    With ?wait=<seconds>, hold the request until the job finishes (long-poll, capped at JOB_MAX_WAIT_S).
+    include_text/offsets shape the result as on /parse.
+    """
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job: {job_id}")
+    job = await jobs.wait(job, min(max(wait, 0), JOB_MAX_WAIT_S))
+    out = job.to_dict()
+    if "result" in out:
+        out["result"] = shape_result(out["result"], include_text, offsets)
+    return FastJSONResponse(out)
+
+# ---------- Admin: hot reload and A/B serving ----------
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+async def start_loading(change) -> Dict:
+    """Run a registry change that starts a background load; 400 for a bad model, 409 while another loads."""
+    try:
+        await change
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return registry.stats()
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+def admin_models():
+    return registry.stats()
+
+@app.post("/admin/models/reload", status_code=202, dependencies=[Depends(require_admin)])
+async def admin_reload(path: Optional[str] = None):
+    """
+    Load `path` (default: the active model's directory, re-read from disk) in
+    the background and make it the active model once every worker has it
+    loaded and warmed up. Poll GET /admin/models for progress.
+    """
+    return await start_loading(registry.reload(path))
+
+@app.post("/admin/models/candidate", status_code=202, dependencies=[Depends(require_admin)])
+async def admin_candidate(path: str, percent: float = 10):
+    """Load `path` next to the active model and send it `percent` of the documents once it is ready."""
+    return await start_loading(registry.set_candidate(path, percent))
+
+@app.delete("/admin/models/candidate", dependencies=[Depends(require_admin)])
+def admin_clear_candidate():
+    registry.clear_candidate()
+    return registry.stats()
+
+@app.post("/admin/models/promote", dependencies=[Depends(require_admin)])
+def admin_promote():
+    try:
+        registry.promote()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return registry.stats()
@@ -0,0 +1,218 @@
+"""
+Prometheus metrics, rendered in the text exposition format on /metrics.
+
+Parsing runs in worker processes, so workers do not touch these objects:
+they return each document's stage timings and sizes with its result
+(pipeline.parse_one / parse_batch) and the API process records them with
+observe_document(). Every update happens on the event loop thread, so the
+metrics need no locking.
+"""
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.responses import Response
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+CHAR_BUCKETS = (500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self.series: Dict[LabelValues, List[float]] = {}  # bucket counts + [sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        lines = []
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                le = f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, inf)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+HTTP_REQUESTS = Counter("resume_http_requests_total", "HTTP requests by route and status code.", ("route", "status"))
+HTTP_SECONDS = Histogram("resume_http_request_seconds", "HTTP request latency by route.", ("route",))
+IN_FLIGHT = Gauge("resume_http_requests_in_flight", "HTTP requests being served.")
+STAGE_SECONDS = Histogram(
+    "resume_stage_seconds",
+    "Time per document in each stage (upload, extract, clean, ner, group) by file type.",
+    ("stage", "file_type"),
+)
+DOC_PAGES = Histogram("resume_document_pages", "Pages per PDF document.", buckets=PAGE_BUCKETS)
+DOC_CHARS = Histogram("resume_document_chars", "Characters per document after cleaning.", ("file_type",),
+                      buckets=CHAR_BUCKETS)
+ENTITIES = Counter("resume_entities_total", "Entities extracted, by label.", ("label",))
+DOC_ERRORS = Counter("resume_document_errors_total", "Documents that could not be parsed, by status code.", ("status",))
+NER_CHARS = Counter("resume_ner_chars_total",
+                    "Characters of cleaned text by how section-aware NER handled them (ner, dictionary, skipped).",
+                    ("handling",))
+
+# Per served model, so an A/B candidate can be compared with the active model under the same traffic.
+MODEL_INFO = Gauge("resume_model_info", "1 for each model being served, with its role (active or candidate).",
+                   ("model", "role"))
+MODEL_DOCS = Counter("resume_model_documents_total", "Documents parsed, by model.", ("model",))
+MODEL_NER_SECONDS = Histogram("resume_model_ner_seconds", "NER time per document, by model.", ("model",))
+MODEL_ENTITIES = Counter("resume_model_entities_total", "Entities extracted, by model and label.", ("model", "label"))
+
+ADMISSION_REJECTED = Counter("resume_admission_rejected_total",
+                             "Requests turned away by admission control, by reason (rate, capacity, tenant, busy).",
+                             ("reason",))
+ADMISSION_IN_USE = Gauge("resume_admission_cost_in_use",
+                         "Estimated cost units of the requests being parsed (across workers sharing the limit state).")
+
+REGISTRY: List[Metric] = [HTTP_REQUESTS, HTTP_SECONDS, IN_FLIGHT, STAGE_SECONDS, DOC_PAGES, DOC_CHARS, ENTITIES, DOC_ERRORS,
+                          NER_CHARS, MODEL_INFO, MODEL_DOCS, MODEL_NER_SECONDS, MODEL_ENTITIES, ADMISSION_REJECTED, ADMISSION_IN_USE]
+
+
+def observe_document(doc_metrics: Dict, upload_ms: Optional[float] = None, model: Optional[str] = None) -> None:
+    """Record what a worker reported for one document (see pipeline.parse_one), parsed by `model` (an id)."""
+    file_type = doc_metrics.get("file_type", "unknown")
+    if upload_ms is not None:
+        STAGE_SECONDS.observe(upload_ms / 1000, stage="upload", file_type=file_type)
+    for stage, ms in doc_metrics.get("stages_ms", {}).items():
+        STAGE_SECONDS.observe(ms / 1000, stage=stage, file_type=file_type)
+    if "error" in doc_metrics:
+        DOC_ERRORS.inc(status=doc_metrics["error"])
+        return
+    if doc_metrics.get("pages"):
+        DOC_PAGES.observe(doc_metrics["pages"])
+    if "chars" in doc_metrics:  # not for cache hits
+        DOC_CHARS.observe(doc_metrics["chars"], file_type=file_type)
+    for label, n in doc_metrics.get("entities", {}).items():
+        ENTITIES.inc(n, label=label)
+    for handling, n in doc_metrics.get("ner_chars", {}).items():
+        NER_CHARS.inc(n, handling=handling)
+    if model is not None and "chars" in doc_metrics:
+        MODEL_DOCS.inc(model=model)
+        if "ner" in doc_metrics.get("stages_ms", {}):
+            MODEL_NER_SECONDS.observe(doc_metrics["stages_ms"]["ner"] / 1000, model=model)
+        for label, n in doc_metrics.get("entities", {}).items():
+            MODEL_ENTITIES.inc(n, model=model, label=label)
+
+def set_models(roles: Dict[str, str]) -> None:
+    """roles: {model id: "active" | "candidate"}; models no longer served drop out of resume_model_info."""
+    MODEL_INFO.values.clear()
+    for model, role in roles.items():
+        MODEL_INFO.set(1, model=model, role=role)
+
+def server_timing(doc_metrics: Dict, upload_ms: Optional[float] = None) -> str:
+    """Server-Timing header value, e.g. 'upload;dur=1.2, extract;dur=30.5, ner;dur=12.0'."""
+    stages = dict(doc_metrics.get("stages_ms", {}))
+    if upload_ms is not None:
+        stages = {"upload": upload_ms, **stages}
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in stages.items())
+
+def render() -> Response:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return Response("\n".join(lines) + "\n", media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """Counts requests by route template and status, times them and tracks in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            # FastAPI stores the matched route on the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(route=route, status=str(status))
+            HTTP_SECONDS.observe(time.perf_counter() - t0, route=route)
@@ -0,0 +1,241 @@
+"""
+Which models the API serves, and how traffic is split between them.
+
+There is always an active model. Optionally, a candidate gets a share of
+the traffic (an A/B test). A document's route is decided from its content
+hash, so the same file always goes to the same model and its cached result
+stays valid. Each model is identified by its directory name plus a hash of
+its meta.json version and its files' names, sizes and mtimes (ModelSlot.id),
+which is cheap enough for a cold start. Result cache keys and per-model
+metrics use that id, so a retrained model copied over the old one counts as
+a new model. Models loaded from the admin endpoints also get a hash of
+their file contents (ModelSlot.digest), to check exactly what is served.
+
+Loading a model never blocks serving. The pool loads and warms up the new
+set in the background (WorkerPool.load_models) and swaps it in when it is
+ready; until then requests keep going to the old models. Reloads are
+started from the admin endpoints, or by watch() when the files in the
+active model's directory change.
+"""
+import asyncio
+import hashlib
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+import metrics
+from cache import model_version
+from workers import WorkerPool
+
+STATS_WINDOW = 1000  # documents per model kept for the A/B summary
+
+
+def _model_files(path: Path) -> List[Path]:
+    return sorted(p for p in path.rglob("*") if p.is_file() and not p.name.startswith("."))
+
+def fingerprint(path: Path) -> str:
+    """Short hash of a model directory's file names and contents (reads every byte)."""
+    h = hashlib.sha1()
+    for p in _model_files(path):
+        h.update(str(p.relative_to(path)).encode("utf-8"))
+        h.update(p.read_bytes())
+    return h.hexdigest()[:10]
+
+def quick_fingerprint(path: Path, version: str) -> str:
+    """Short hash of the model version and its files' names, sizes and mtimes (no file is read)."""
+    h = hashlib.sha1(version.encode("utf-8"))
+    for p in _model_files(path):
+        st = p.stat()
+        h.update(f"{p.relative_to(path)}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()[:10]
+
+def stat_signature(path: Path) -> tuple:
+    """Cheap change check for the watcher: names, sizes and mtimes."""
+    try:
+        return tuple((str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in _model_files(path))
+    except OSError:  # a file vanished mid-copy
+        return ()
+
+
+@dataclass
+class ModelSlot:
+    path: Path
+    id: str
+    version: str
+    digest: Optional[str] = None  # content hash, only for models loaded from the admin endpoints
+    loaded_at: float = field(default_factory=time.time)
+    ner_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=STATS_WINDOW), repr=False)
+    entities: Deque[int] = field(default_factory=lambda: deque(maxlen=STATS_WINDOW), repr=False)
+    docs: int = 0
+
+    @classmethod
+    def read(cls, path, digest: bool = False) -> "ModelSlot":
+        path = Path(path).resolve()
+        if not (path / "config.cfg").is_file():
+            raise ValueError(f"Not a spaCy model directory: {path}")
+        version = model_version(path)
+        return cls(path=path, id=f"{path.name}-{quick_fingerprint(path, version)}", version=version,
+                   digest=fingerprint(path) if digest else None)
+
+    @property
+    def model(self) -> str:
+        """What pipeline.parse_one / parse_batch take as `model`."""
+        return str(self.path)
+
+    def observe(self, doc_metrics: Dict) -> None:
+        if "chars" not in doc_metrics:  # cache hits and errors
+            return
+        self.docs += 1
+        self.ner_ms.append(doc_metrics.get("stages_ms", {}).get("ner", 0.0))
+        self.entities.append(sum(doc_metrics.get("entities", {}).values()))
+
+    def to_dict(self) -> Dict:
+        ner = sorted(self.ner_ms)
+        pick = lambda q: round(ner[min(len(ner) - 1, int(round(q * (len(ner) - 1))))], 1) if ner else 0.0
+        return {
+            "id": self.id,
+            "path": str(self.path),
+            "version": self.version,
+            "digest": self.digest,
+            "loaded_at": round(self.loaded_at, 3),
+            "docs": self.docs,
+            "ner_ms": {"p50": pick(0.50), "p95": pick(0.95)},
+            "entities_per_doc": round(sum(self.entities) / len(self.entities), 2) if self.entities else 0.0,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, pool: WorkerPool, model_dir):
+        self.pool = pool
+        self.active = ModelSlot.read(model_dir)
+        self.candidate: Optional[ModelSlot] = None
+        self.candidate_percent = 0.0
+        self.loading: Optional[str] = None  # what is being loaded right now
+        self.last_error: Optional[str] = None
+        self.last_load_ms: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._publish()
+
+    # ---------- routing ----------
+    def route(self, digest: str) -> ModelSlot:
+        """The model for a document, from its sha256 hex digest."""
+        if self.candidate is not None and int(digest[:8], 16) % 10000 < self.candidate_percent * 100:
+            return self.candidate
+        return self.active
+
+    def slot(self, model_id: str) -> Optional[ModelSlot]:
+        for s in (self.active, self.candidate):
+            if s is not None and s.id == model_id:
+                return s
+        return None
+
+    # ---------- changes (admin API / watcher) ----------
+    def busy(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def reload(self, path=None, only_if_changed: bool = False) -> ModelSlot:
+        """Start loading a new active model (default: the active directory again). Returns it at once."""
+        slot = await asyncio.to_thread(ModelSlot.read, path or self.active.path)
+        if only_if_changed and slot.id == self.active.id:
+            return self.active
+        if not only_if_changed:  # an admin reload: worth reading the files for the content hash
+            slot.digest = await asyncio.to_thread(fingerprint, slot.path)
+        dirs = [slot.model] + ([self.candidate.model] if self.candidate else [])
+        self._start(f"active {slot.id}", dirs, lambda: self._activate(slot))
+        return slot
+
+    async def set_candidate(self, path, percent: float) -> ModelSlot:
+        """Start loading a candidate that gets `percent` of the documents once it is ready."""
+        if not 0 <= percent <= 100:
+            raise ValueError("percent must be between 0 and 100.")
+        slot = await asyncio.to_thread(ModelSlot.read, path, True)
+        if slot.path == self.active.path:
+            raise ValueError("The candidate must be a different directory from the active model.")
+        if self.candidate is not None and self.candidate.id == slot.id:  # already loaded: change the share only
+            self.candidate_percent = percent
+            return self.candidate
+
+        def done():
+            self.candidate, self.candidate_percent = slot, percent
+        self._start(f"candidate {slot.id}", [self.active.model, slot.model], done)
+        return slot
+
+    def clear_candidate(self) -> None:
+        """Stop routing to the candidate. Workers keep it in memory until the next reload."""
+        self.candidate, self.candidate_percent = None, 0.0
+        self._publish()
+
+    def promote(self) -> ModelSlot:
+        """Make the candidate the active model. Both are already loaded, so this is immediate."""
+        if self.candidate is None:
+            raise ValueError("There is no candidate to promote.")
+        self.active, self.candidate, self.candidate_percent = self.candidate, None, 0.0
+        self._publish()
+        return self.active
+
+    def _start(self, what: str, model_dirs: List[str], on_ready) -> None:
+        if self.busy():
+            raise RuntimeError(f"Already loading {self.loading}.")
+        self.loading, self.last_error = what, None
+        self._task = asyncio.create_task(self._load(model_dirs, on_ready))
+
+    async def _load(self, model_dirs: List[str], on_ready) -> None:
+        try:
+            self.last_load_ms = await self.pool.load_models(model_dirs)
+            on_ready()
+            self._publish()
+        except Exception as e:
+            self.last_error = f"{self.loading}: {e}"
+        finally:
+            self.loading = None
+
+    def _activate(self, slot: ModelSlot) -> None:
+        self.active = slot
+
+    def _publish(self) -> None:
+        roles = {self.active.id: "active"}
+        if self.candidate is not None:
+            roles[self.candidate.id] = "candidate"
+        metrics.set_models(roles)
+
+    # ---------- watcher ----------
+    async def watch(self, interval_s: float) -> None:
+        """
+        Reload the active model when its directory changes. A change must
+        look the same on two polls in a row before it is loaded, so a model
+        is not picked up halfway through being copied in.
+        """
+        seen = await asyncio.to_thread(stat_signature, self.active.path)
+        pending = None
+        while True:
+            await asyncio.sleep(interval_s)
+            current = await asyncio.to_thread(stat_signature, self.active.path)
+            if current == seen or not current:
+                pending = None
+                continue
+            if current != pending:
+                pending = current
+                continue
+            if self.busy():
+                continue
+            seen, pending = current, None
+            try:
+                await self.reload(only_if_changed=True)
+            except (OSError, ValueError, RuntimeError) as e:
+                self.last_error = f"watch: {e}"
+
+    async def shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active.to_dict(),
+            "candidate": None if self.candidate is None else {**self.candidate.to_dict(), "percent": self.candidate_percent},
+            "loading": self.loading,
+            "last_load_ms": self.last_load_ms,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,55 @@
+"""
+Response shaping and serialisation.
+
+Parse results always carry the cleaned text and, under data.spans, every
+entity's character offsets into that text. Both are trimmed per request
+(shape_result): by default the text is kept and the spans are dropped, so
+the payload is the same as before the options existed.
+
+Responses are serialised with orjson when it is installed, and the batch
+endpoint streams its results one by one instead of building one large
+document in memory.
+"""
+import json
+from typing import Dict, Iterable, Iterator
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library gives the same JSON, more slowly
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def shape_result(result: Dict, include_text: bool = True, offsets: bool = False) -> Dict:
+    """Drop data.text unless include_text, and data.spans unless offsets; errors pass through."""
+    data = result.get("data")
+    if data is None:
+        return result
+    drop = set()
+    if not include_text:
+        drop.add("text")
+    if not offsets:
+        drop.add("spans")
+    return {**result, "data": {k: v for k, v in data.items() if k not in drop}}
+
+def stream_batch(summary: Dict, results: Iterable[Dict]) -> StreamingResponse:
+    """{**summary, "results": [...]} written one result at a time."""
+    def chunks() -> Iterator[bytes]:
+        head = dumps({**summary, "results": []})
+        yield head[:-2]  # up to and including the "[" of the empty results array
+        for i, result in enumerate(results):
+            yield (b"," if i else b"") + dumps(result)
+        yield b"]}"
+    return StreamingResponse(chunks(), media_type="application/json")
@@ -0,0 +1,251 @@
+"""
+Rule-based resume sections, for running NER only where entities are.
+
+split_sections() finds headings with three cheap line heuristics (the same
+kind guess_name in training/show_mismatches.py uses):
+
+  - a short line that is a heading on its own ("Skills", "WORK EXPERIENCE:");
+  - a Title Case or UPPER CASE heading starting a line, followed by its
+    content ("Education Sorbonne University ...", "Languages English — Native");
+  - an UPPER CASE heading anywhere in a line, as PDF extraction often runs
+    sections together ("... github.com/x SKILLS Python, ...").
+
+clean_text joins most line breaks ("Fluent\nHobbies" -> "Fluent Hobbies"),
+so the caller can pass where it did (prepare_text's `breaks`); those spaces
+count as line starts here.
+
+A section runs from its heading to the next one. Before the first heading
+is the header: its name line and contact lines (e-mail, phone, links) near
+the top are "contact", the rest (a title, a summary) is "header".
+
+plan_sections() then decides per section:
+
+  ner         kept for the NER (skills, experience, education, projects, ...)
+  dictionary  Language sections made only of language names and levels are
+              matched with LanguageMatcher instead; one with anything else in
+              it ("Languages: Python, Go" inside a skills block) goes to NER
+  skipped     SKIP_SECTIONS (contacts, references, hobbies, ...)
+
+A missed heading leaves its text in the section before it. That costs speed
+(more text for the NER), not entities, unless the section before is skipped.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from canonical import LEVEL_WORDS
+
+SECTION_HEADINGS: Dict[str, Tuple[str, ...]] = {
+    "summary": ("summary", "professional summary", "profile", "professional profile", "about me", "objective",
+                "career objective"),
+    "skills": ("skills", "technical skills", "key skills", "core skills", "hard skills", "soft skills",
+               "skills and tools", "core competencies", "competencies", "technologies", "tech stack",
+               "tools and technologies", "expertise"),
+    "experience": ("experience", "work experience", "professional experience", "relevant experience",
+                   "employment", "employment history", "work history", "career history"),
+    "education": ("education", "academic background", "education and training"),
+    "projects": ("projects", "personal projects", "university projects", "selected projects", "side projects",
+                 "project work"),
+    "languages": ("languages", "language skills", "spoken languages"),
+    "certifications": ("certifications", "certificates", "certifications and awards", "awards and certificates",
+                       "licenses and certifications", "courses"),
+    "publications": ("publications",),
+    "awards": ("awards", "honors", "honours", "achievements", "awards and honors"),
+    "interests": ("interests", "hobbies", "hobbies and interests", "volunteering"),
+    "references": ("references", "referees", "references available upon request"),
+    "contact": ("contact", "contacts", "contact information", "contact details", "personal information",
+                "personal details"),
+}
+SKIP_SECTIONS = ("contact", "references", "interests", "publications", "awards")
+HEADING_MAX_CHARS = 40
+
+_HEADING_KINDS = {phrase: kind for kind, phrases in SECTION_HEADINGS.items() for phrase in phrases}
+# longest first, so "work experience" wins over "experience"; "&" is spelled either way
+_PHRASES = sorted(_HEADING_KINDS, key=len, reverse=True)
+
+
+def _alternation(phrases: Iterable[str]) -> str:
+    """Regex for the phrases, with any run of spaces between words and "and" or "&"."""
+    return "|".join(re.escape(p).replace(r"\ and\ ", r"\s*(?:and|&)\s*").replace(r"\ AND\ ", r"\s*(?:AND|&)\s*")
+                    .replace(r"\ ", r"\s+") for p in phrases)
+
+_LINE_START_RE = re.compile(rf"[ \t]*(?:[-•●*▪][ \t]*)?({_alternation(_PHRASES)})(?=[ \t]*[:—–-]|[ \t]+\S)",
+                            re.IGNORECASE)
+# the lookahead rules out most positions before the alternation is tried
+_UPPER_RE = re.compile(rf"(?<![\w&/])(?=[A-Z]{{2}})({_alternation(p.upper() for p in _PHRASES)})(?![\w&/])")
+_BULLETS = " \t-•●*▪:"
+
+_LEVELS = "|".join(w for w in LEVEL_WORDS if w not in ("of", "level")) + r"|[abc][12]\+?"
+_LEVEL_TAIL = rf"(?:\s*\([^()\n]{{1,60}}\)|[ \t]*[—–-][ \t]*(?:{_LEVELS})(?:[ \t]+(?:{_LEVELS}))*|[ \t]+(?:[abc][12]\+?))"
+_LEVEL_HEAD = rf"(?:(?:{_LEVELS})[ \t]+(?:(?:{_LEVELS})[ \t]+)*)"
+_LEFTOVER_WORD_RE = re.compile(r"[^\W\d_]{2,}")
+
+_CONTACT_RE = re.compile(
+    r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"                              # e-mail
+    r"|(?:https?://)?(?:www\.)?[\w-]+(?:\.[\w-]+)*\.(?:com|org|net|io|dev|me|ai)\b(?:/\S*)?"  # links
+    r"|\+?\(?\d[\d\s().-]{6,}\d"                                   # phone numbers
+    r"|\b(?:github|linkedin|telegram|skype|email|e-mail|phone|tel|mobile)\b",
+    re.IGNORECASE,
+)
+CONTACT_MAX_WORDS = 3   # words besides contact details on a contact line ("Berlin, Germany")
+CONTACT_MAX_LINES = 8   # only the top of the header is looked at for the name and contacts
+_LEVEL_WORD_RE = re.compile(rf"(?:{_LEVELS}|and)", re.IGNORECASE)
+
+
+@dataclass
+class Section:
+    kind: str       # a SECTION_HEADINGS key, or "header" for the text before the first heading
+    start: int
+    end: int
+    heading: str
+
+    def to_dict(self) -> Dict:
+        return {"kind": self.kind, "heading": self.heading, "start": self.start, "end": self.end}
+
+
+def _kind(phrase: str) -> Optional[str]:
+    key = " ".join(phrase.casefold().replace("&", " and ").split())
+    return _HEADING_KINDS.get(key)
+
+def _is_titled(phrase: str) -> bool:
+    words = [w for w in re.split(r"[\s&]+", phrase) if w and w.lower() != "and"]
+    return phrase.isupper() or all(w[:1].isupper() for w in words)
+
+def _lines(text: str, breaks: Sequence[int] = ()) -> Iterator[Tuple[int, str]]:
+    """(offset, line) for the text cut after its newlines and after the joined breaks."""
+    cuts = {b + 1 for b in breaks if b + 1 < len(text)}
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        pos += len(line)
+        cuts.add(pos)
+    pos = 0
+    for cut in sorted(cuts):
+        yield pos, text[pos:cut]
+        pos = cut
+
+def _headings(text: str, breaks: Sequence[int] = ()) -> List[Tuple[int, int, str]]:
+    """(start, end, kind) of every heading, in text order, not overlapping."""
+    found = []
+    for pos, line in _lines(text, breaks):
+        body = line.strip()
+        bare = body.strip(_BULLETS)
+        if bare and len(bare) <= HEADING_MAX_CHARS and _kind(bare):
+            start = pos + line.index(bare)
+            found.append((start, start + len(bare), _kind(bare)))
+        else:
+            m = _LINE_START_RE.match(line)
+            if m and _is_titled(m.group(1)):
+                found.append((pos + m.start(1), pos + m.end(1), _kind(m.group(1))))
+    found.extend((m.start(1), m.end(1), _kind(m.group(1))) for m in _UPPER_RE.finditer(text))
+    found.sort()
+    out: List[Tuple[int, int, str]] = []
+    for h in found:
+        if not out or h[0] >= out[-1][1]:
+            out.append(h)
+    return out
+
+def _is_name(line: str) -> bool:
+    """guess_name's test: 2-4 words, mostly capitalised (or all caps), no digits or e-mail."""
+    words = line.split()
+    titled = sum(1 for w in words if w[:1].isupper())
+    return (2 <= len(words) <= 4 and len(line) <= 60 and (titled >= 2 or line.isupper())
+            and not re.search(r"[@\d]", line))
+
+def _is_contact(line: str) -> bool:
+    if not _CONTACT_RE.search(line):
+        return False
+    return len(_LEFTOVER_WORD_RE.findall(_CONTACT_RE.sub(" ", line))) <= CONTACT_MAX_WORDS
+
+def _split_header(text: str, end: int, breaks: Sequence[int] = ()) -> List[Section]:
+    """The header cut into "contact" pieces (the name line and contact lines) and "header" pieces (the rest)."""
+    pieces: List[Section] = []
+    first = True
+    for i, (pos, line) in enumerate(_lines(text[:end], breaks)):
+        body = line.strip()
+        if i >= CONTACT_MAX_LINES:
+            pieces.append(Section("header", pos, end, ""))
+            break
+        kind = "contact" if body and ((first and _is_name(body)) or _is_contact(body)) else "header"
+        first = first and not body
+        if pieces and (pieces[-1].kind == kind or not body):
+            pieces[-1].end = pos + len(line)
+        else:
+            pieces.append(Section(kind, pos, pos + len(line), ""))
+    return pieces
+
+def split_sections(text: str, breaks: Sequence[int] = ()) -> List[Section]:
+    """
+    The text cut into consecutive sections. What comes before the first
+    heading (all of it, without headings) is split by _split_header.
+    breaks: offsets of spaces that were line breaks before cleaning.
+    """
+    heads = _headings(text, breaks)
+    sections = _split_header(text, heads[0][0] if heads else len(text), breaks)
+    for (start, end, kind), nxt in zip(heads, heads[1:] + [(len(text), 0, "")]):
+        sections.append(Section(kind, start, nxt[0], text[start:end]))
+    return sections
+
+
+class LanguageMatcher:
+    """Language names with their level: "English (C1)", "German — Fluent", "native Russian"."""
+
+    def __init__(self, names: Iterable[str]):
+        names = sorted({n for n in names if n}, key=len, reverse=True)
+        alternation = "|".join(re.escape(n) for n in names)
+        self.regex = re.compile(rf"\b(?:{_LEVEL_HEAD})?(?:{alternation})\b{_LEVEL_TAIL}?", re.IGNORECASE)
+
+    def find(self, text: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
+        return [m.span() for m in self.regex.finditer(text, start, len(text) if end is None else end)]
+
+    def covers(self, text: str, start: int, end: int, spans: List[Tuple[int, int]]) -> bool:
+        """True if text[start:end] holds nothing but these spans, levels and punctuation."""
+        pos = start
+        rest = []
+        for s, e in spans:
+            rest.append(text[pos:s])
+            pos = e
+        rest.append(text[pos:end])
+        leftover = [w for w in _LEFTOVER_WORD_RE.findall(" ".join(rest)) if not _LEVEL_WORD_RE.fullmatch(w)]
+        return bool(spans) and not leftover
+
+
+@dataclass
+class SectionPlan:
+    sections: List[Section]
+    handling: List[str]                 # per section: "ner", "dictionary" or "skipped"
+    ner: List[Tuple[int, int]]          # character ranges for the NER
+    languages: List[Tuple[int, int]]    # Language entities from the dictionary
+
+    def chars(self) -> Dict[str, int]:
+        out = {"ner": 0, "dictionary": 0, "skipped": 0}
+        for section, how in zip(self.sections, self.handling):
+            out[how] += section.end - section.start
+        return out
+
+    def to_dict(self) -> Dict:
+        return {"chars": self.chars(),
+                "sections": [{**s.to_dict(), "handling": how} for s, how in zip(self.sections, self.handling)]}
+
+
+def plan_sections(text: str, matcher: LanguageMatcher, skip: Iterable[str] = SKIP_SECTIONS,
+                  breaks: Sequence[int] = ()) -> SectionPlan:
+    sections = split_sections(text, breaks)
+    skip = set(skip)
+    handling, ner, languages = [], [], []
+    for s in sections:
+        if s.kind in skip:
+            handling.append("skipped")
+            continue
+        if s.kind == "languages":
+            body = s.start + len(s.heading)
+            spans = matcher.find(text, body, s.end)
+            if matcher.covers(text, body, s.end, spans):
+                handling.append("dictionary")
+                languages.extend(spans)
+                continue
+        handling.append("ner")
+        if ner and ner[-1][1] == s.start:  # adjacent sections go to the NER as one piece
+            ner[-1] = (ner[-1][0], s.end)
+        else:
+            ner.append((s.start, s.end))
+    return SectionPlan(sections, handling, ner, languages)
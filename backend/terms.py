@@ -0,0 +1,226 @@
+"""
+Skill / language dictionaries and a matcher that finds them in one scan.
+
+The dictionaries are regex fragments (used for Label Studio prelabels in
+training/make_prelabels.py). TermMatcher expands every fragment that only
+uses literals, escapes, groups, alternation and "?" into its literal
+variants ("CNNs?" -> CNN, CNNs) and compiles all of them into a single
+trie-shaped regex, so a text is scanned once instead of once per term and
+the longest term wins where several start at the same place ("Spring Boot"
+over "Spring"). Fragments that need more (\\s+, character classes, ...)
+are kept as individual regexes and merged into the result.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+SKILL_TERMS = [
+    # Programming languages & core libs
+    r"Python", r"Java", r"JavaScript", r"TypeScript", r"C\+\+", r"C#", r"\bC\b", r"Rust", r"Go", r"R",
+    r"NumPy", r"Pandas", r"scikit-?learn", r"PyTorch", r"TensorFlow", r"Keras", r"LightGBM",
+    r"BeautifulSoup", r"Keras", r"CatBoost", r"Seaborn", r"OpenCV",
+
+    # Visualization & analysis
+    r"Matplotlib", r"Seaborn", r"Plotly", r"Tableau", r"Power BI", r"D3\.js",
+    r"EDA", r"Exploratory Data Analysis", r"Statistical Analysis", r"Statistics", r"Statistical Modeling",
+    r"Data Visualization", r"Data Cleaning", r"Data Preprocessing", r"Data Analysis", r"Business analytics",
+    r"Regression Analysis", r"Classification", r"Clustering", r"AB-?Testing", r"A/B Testing",
+
+    # ML & AI concepts
+    r"Supervised learning", r"Unsupervised learning", r"Machine Learning",
+    r"Deep Learning", r"CNNs?", r"RNNs?", r"Transformers?",
+    r"Reinforcement Learning", r"Computer Vision", r"Named Entity Recognition",
+    r"Feature Engineering", r"Hyperparameter Tuning", r"Algorithms", r"data structures",
+    r"NLP", r"Robotics", r"Ray", r"MLflow", r"JAX", r"Hugging Face", r"spaCy",
+
+    # Model evaluation metrics
+    r"Model Evaluation", r"Accuracy", r"Precision", r"Recall", r"F1-?score", r"ROC-?AUC",
+
+    # Backend / web frameworks & patterns
+    r"Spring Boot", r"Spring", r"Django", r"Django REST Framework", r"DRF", r"Celery",
+    r"Flask", r"REST API", r"GraphQL", r"Apollo",
+    r"Node\.js", r"Express(\.js)?", r"NestJS", r"gRPC", r"socket\.io",
+
+    # Frontend ecosystem
+    r"React(\.js)?", r"Next\.js", r"Redux", r"React hooks", r"React-?router", r"Angular",
+    r"redux-?saga", r"redux-?thunk", r"Effector", r"VueJS?",
+    r"HTML5?", r"CSS3?", r"SCSS", r"PostCSS", r"JSS",
+    r"CSS Modules", r"BEM", r"CSS-?in-?JS", r"Styled components",
+    r"Material UI", r"DOM API", r"Canvas API", r"SVG",
+    r"PWA", r"Web Workers", r"Push Notifications", r"IndexedDB",
+    r"WebSockets?", r"HTTP", r"SSR",
+    r"RxJS", r"UI/UX design principles", r"UX",
+
+    # Mobile Development
+    r"Kotlin", r"Swift", r"SwiftUI", r"Firebase",
+
+    # Build & dev tools
+    r"Webpack", r"Babel", r"npm", r"yarn", r"Bazel",
+    r"ESLint", r"Prettier", r"Storybook", r"Chrome Devtools?", r"Figma", r"PyCharm", r"Jupyter Notebook",
+    r"Maven", r"Gradle", r"Jenkins", r"TeamCity", r"Splunk", r"Prometheus", r"Grafana",
+    r"GitHub Actions", r"Selenium", r"JMeter", r"Postman",
+
+    # DevOps / CI/CD & Infrastructure
+    r"CI/CD", r"Git", r"GitHub", r"Bitbucket", r"OpenShift",
+    r"Docker", r"Kubernetes", r"Terraform", r"OpenShift",
+
+    # Cloud & big data stack
+    r"AWS", r"GCP", r"Azure",
+    r"EMR", r"EC2", r"S3", r"DynamoDB", r"SQS", r"SNS", r"Lambda", r"AWS CDK",
+    r"AWS Step Functions", r"AWS Batch", r"Athena",
+    r"Elasticsearch", r"Elastic ?Search", r"Kafka", r"Spark", r"Hadoop", r"Hive", r"Presto", r"Druid", r"Zookeeper", r"Qubole",
+    r"Airflow", r"BigQuery",
+
+    # Monitoring & Logging
+    r"ELK",
+
+    # Security
+    r"Kali Linux", r"Snort", r"Wireshark",
+
+    # Robotics & Embedded Systems
+    r"ROS", r"Embedded Systems", r"Gazebo",
+
+    # Databases
+    r"MySQL", r"DB2", r"MongoDB", r"Databases?", r"NoSQL", r"PostgreSQL", r"Oracle", r"ClickHouse", r"Hazelcast", r"\bSQL\b",
+
+    # General tools & collaboration
+    r"Git", r"Linux", r"Jupyter Notebook", r"APIs?", r"Excel",
+    r"Jira", r"Confluence", r"Cloud platforms?", r"Docker", r"Bash", r"vim", r"LATEX",
+
+    # Methodologies & practices
+    r"Agile", r"Scrum", r"SDLC", r"Microservices",
+    r"Microservice architecture", r"Micro-?frontend architecture",
+    r"Performance Optimization", r"Web Security", r"SEO", r"Web Accessibility", r"a11y",
+    r"OOP", r"SOLID", r"Design patterns", r"Clean Code", r"REST API", r"API development",
+    r"Unit tests?", r"Integration tests?", r"e2e tests?", r"Screenshot tests?",
+    r"Jest", r"React-?testing-?library", r"Cypress", r"Hermione", r"RAII",
+    r"Product Roadmaps", r"API Design",
+
+    # Soft/role-adjacent technical skills (keep for recall)
+    r"Client Requirement Scoping",
+    r"Cross-?functional Collaboration",
+    r"Mentoring",
+    r"Problem solving",
+    r"Debugging",
+]
+
+
+
+
+LANGUAGE_TERMS = [
+    r"(?:German|French|Spanish|Russian|English)(?:(?:\s+-\s*|\s+)(?:native|fluent|advanced|intermediate|beginner|basic|proficient|working\s+knowledge))?",
+    r"(?:native|fluent|advanced|intermediate|beginner|basic|proficient|working\s+knowledge)(?:\s+of)?(?:\s+(?:German|French|Spanish|Russian|English))",
+    r"German(?:\s*\([A-C][12]\)|\s*-\s*(Beginner|Intermediate|Advanced|Fluent)|\s*B[12]|C[12])?",
+    r"English(?:\s*\([A-C][12]\)|\s*-\s*(Beginner|Intermediate|Advanced|Advanced|Fluent))?",
+    r"French(?:\s*\([A-C][12]\)|\s*-\s*(Beginner|Intermediate|Advanced|Fluent))?",
+    r"Russian(?:\s*\([A-C][12]\)|\s*-\s*(Beginner|Intermediate|Advanced|Fluent))?",
+    r"Spanish(?:\s*\([A-C][12]\)|\s*-\s*(Beginner|Intermediate|Advanced|Fluent))?"
+]
+
+
+class _Unsupported(Exception):
+    pass
+
+def _expand_alternatives(p: str, i: int) -> Tuple[List[str], int]:
+    variants, i = _expand_sequence(p, i)
+    while i < len(p) and p[i] == "|":
+        more, i = _expand_sequence(p, i + 1)
+        variants += more
+    return variants, i
+
+def _expand_sequence(p: str, i: int) -> Tuple[List[str], int]:
+    variants = [""]
+    while i < len(p) and p[i] not in "|)":
+        atom, i = _expand_atom(p, i)
+        if i < len(p) and p[i] == "?":
+            atom = atom + [""]
+            i += 1
+        elif i < len(p) and p[i] in "*+{":
+            raise _Unsupported(p)
+        variants = [v + a for v in variants for a in atom]
+    return variants, i
+
+def _expand_atom(p: str, i: int) -> Tuple[List[str], int]:
+    c = p[i]
+    if c == "(":
+        i += 1
+        if p.startswith("?:", i):
+            i += 2
+        elif i < len(p) and p[i] == "?":
+            raise _Unsupported(p)
+        variants, i = _expand_alternatives(p, i)
+        if i >= len(p) or p[i] != ")":
+            raise _Unsupported(p)
+        return variants, i + 1
+    if c == "\\":
+        nxt = p[i + 1:i + 2]
+        if nxt == "b" and (i == 0 or i + 2 == len(p)):
+            return [""], i + 2  # word boundaries are added around every term anyway
+        if nxt and not nxt.isalnum():
+            return [nxt], i + 2
+        raise _Unsupported(p)
+    if c in "[]{}*+?.^$":
+        raise _Unsupported(p)
+    return [c], i + 1
+
+def expand_term(pattern: str) -> Optional[List[str]]:
+    """Literal strings matched by a simple regex fragment, or None if it is not simple."""
+    try:
+        variants, i = _expand_alternatives(pattern, 0)
+    except (_Unsupported, IndexError):
+        return None
+    if i != len(pattern):
+        return None
+    return [v for v in dict.fromkeys(variants) if v]
+
+def trie_regex(words: List[str]) -> str:
+    """Regex matching any of words; at each branch point longer continuations are tried first."""
+    trie: Dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            # greedy optional: the longer term is tried first, the shorter one on backtrack
+            return "(?:" + body + ")?" if len(branches) > 1 or len(body) > 1 else body + "?"
+        return body
+
+    return build(trie)
+
+
+class TermMatcher:
+    """Non-overlapping, leftmost-longest, case-insensitive matches of a term dictionary."""
+
+    def __init__(self, patterns: List[str]):
+        literals: List[str] = []
+        fallback: List[str] = []
+        for pat in dict.fromkeys(patterns):  # the dictionaries repeat some terms (Git, Docker, Keras, ...)
+            variants = expand_term(pat)
+            if variants is None:
+                fallback.append(pat)
+            else:
+                literals.extend(v.lower() for v in variants)
+        literals = list(dict.fromkeys(literals))
+        self.literal_re = re.compile(rf"\b(?:{trie_regex(literals)})\b", re.IGNORECASE) if literals else None
+        self.fallback_res = [re.compile(rf"\b(?:{pat})\b", re.IGNORECASE) for pat in fallback]
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        spans = [m.span() for m in self.literal_re.finditer(text)] if self.literal_re else []
+        if not self.fallback_res:
+            return spans
+        for rx in self.fallback_res:
+            spans.extend(m.span() for m in rx.finditer(text))
+        spans.sort(key=lambda se: (se[0], -se[1]))
+        kept, last_end = [], -1
+        for start, end in spans:
+            if start >= last_end:
+                kept.append((start, end))
+                last_end = end
+        return kept
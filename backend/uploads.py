@@ -0,0 +1,88 @@
+"""
+Upload size limits enforced while the request streams in.
+
+UploadLimitMiddleware answers 413 straight from Content-Length when the
+client declares an oversized body, and otherwise counts body bytes as they
+arrive (covering chunked uploads), so an oversized request is cut off
+before the multipart parser has buffered it. read_upload then reads the
+file part in chunks, rejecting unsupported content from the first chunk and
+oversized files as soon as they cross the limit.
+"""
+import io
+from typing import BinaryIO, Dict
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from extractors import SNIFF_BYTES, sniff_type, unsupported_message
+from pipeline import ParseError
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MULTIPART_OVERHEAD = 64 * 1024  # boundaries and part headers on top of the file bytes
+
+MB = 1024 * 1024
+
+
+class UploadLimitMiddleware:
+    def __init__(self, app, limits: Dict[str, int]):
+        """limits maps a request path to the maximum request body size in bytes."""
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request too large. Max is {limit // MB} MB."
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException passes through FastAPI's body parsing unchanged
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+    if file.size is not None and file.size > max_bytes:
+        raise ParseError(413, f"File too large ({file.size / MB:.1f} MB). Max is {max_bytes // MB} MB.")
+
+    head = await file.read(max(SNIFF_BYTES, UPLOAD_CHUNK_SIZE))
+    if sniff_type(head[:SNIFF_BYTES], file.filename) is None:
+        raise ParseError(400, unsupported_message(file.filename))
+
+    buf = bytearray(head)
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buf += chunk
+        if len(buf) > max_bytes:
+            raise ParseError(413, f"File too large (over {max_bytes // MB} MB). Max is {max_bytes // MB} MB.")
+    return bytes(buf)
+
+def detach_upload(file: UploadFile) -> BinaryIO:
+    """
+    Take ownership of the (spooled) file behind an upload.
+
+    FastAPI closes form files when the endpoint returns, which is too early
+    for a streaming response that keeps reading the upload; the caller
+    closes the returned file instead.
+    """
+    spooled = file.file
+    file.file = io.BytesIO()
+    return spooled
@@ -0,0 +1,177 @@
+"""
+Worker pool that keeps CPU-bound parsing off the event loop.
+
+With workers > 0 jobs go to a ProcessPoolExecutor whose workers each load the
+spaCy model once; with workers == 0 they run in a single thread of the API
+process (for serverless targets where extra processes are not an option).
+A bounded queue sits in front of the executor: once `workers + queue_size`
+jobs are pending, new ones are rejected with QueueFull instead of piling up.
+
+load_models() changes the served models without a restart. A new executor
+is brought up with them loaded and warmed up in every worker, then swapped
+in. In thread mode the models are loaded next to the running ones and
+swapped into this process instead.
+"""
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Dict, List
+
+import pipeline
+
+LATENCY_WINDOW = 1000  # samples kept for the percentile stats
+READY_PAUSE_S = 0.05   # how long each warm-up probe holds its worker, so probes spread over all of them
+READY_ROUNDS = 20
+
+
+class QueueFull(Exception):
+    """The pool and its queue are saturated."""
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class WorkerPool:
+    def __init__(self, workers: int, queue_size: int, model_dir: str):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.model_dirs = [model_dir]  # the first is each worker's default model
+        self.slots = max(1, workers)
+        self._executor = None
+        self._sem = None
+        self.pending = 0   # queued + running
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.reloads = 0
+        self._latency: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._wait: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def mode(self) -> str:
+        return "process" if self.workers > 0 else "thread"
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        if self.workers > 0:
+            self._executor = self._process_executor(self.model_dirs, pipeline.MODEL_WARMUP)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse")
+        self._sem = asyncio.Semaphore(self.slots)
+
+    def _process_executor(self, model_dirs: List[str], warmup: bool) -> ProcessPoolExecutor:
+        # spawn: forking a process that already runs an event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=pipeline.init_worker,
+            initargs=(list(model_dirs), warmup),
+        )
+
+    async def _wait_ready(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Return once every worker of a new executor has loaded its models.
+        Raises RuntimeError if some never answered a probe within READY_ROUNDS.
+        """
+        loop = asyncio.get_running_loop()
+        seen = set()
+        for _ in range(READY_ROUNDS):
+            probes = [loop.run_in_executor(executor, pipeline.worker_ready, READY_PAUSE_S) for _ in range(self.workers)]
+            seen.update(await asyncio.gather(*probes))
+            if len(seen) >= self.workers:
+                return
+        raise RuntimeError(f"Only {len(seen)} of {self.workers} workers confirmed they had loaded the models.")
+
+    async def load_models(self, model_dirs: List[str]) -> float:
+        """
+        Serve model_dirs from now on (the first is the default) and return
+        how long loading took in ms. Jobs already handed to the old executor
+        finish there. Raises RuntimeError if a model cannot be loaded. The
+        models in use are then left as they were.
+        """
+        self.start()
+        t0 = time.perf_counter()
+        if self.workers > 0:
+            executor = self._process_executor(model_dirs, warmup=True)
+            try:
+                await self._wait_ready(executor)
+            except BrokenProcessPool:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise RuntimeError(f"A worker could not load {', '.join(model_dirs)}; see the server log.")
+            except RuntimeError:  # not all workers ready: keep serving from the old executor
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            old, self._executor = self._executor, executor
+            old.shutdown(wait=False)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, pipeline.install, list(model_dirs), True)
+        self.model_dirs = list(model_dirs)
+        self.reloads += 1
+        return round((time.perf_counter() - t0) * 1000, 1)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn, *args):
+        self.start()
+        if self.pending >= self.slots + self.queue_size:
+            self.rejected += 1
+            raise QueueFull(f"Parser is busy ({self.pending} jobs pending). Try again shortly.")
+
+        self.pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._sem:
+                started_at = time.perf_counter()
+                self._wait.append(started_at - queued_at)
+                self.running += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(self._executor, fn, *args)
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self.running -= 1
+                    self._latency.append(time.perf_counter() - started_at)
+                self.completed += 1
+                return result
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> Dict:
+        latency, wait = list(self._latency), list(self._wait)
+        return {
+            "mode": self.mode,
+            "workers": self.slots,
+            "queue_size": self.queue_size,
+            "running": self.running,
+            "queued": self.pending - self.running,
+            "saturation": round(self.running / self.slots, 3),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "models": self.model_dirs,
+            "reloads": self.reloads,
+            "latency_ms": {
+                "p50": round(_percentile(latency, 0.50) * 1000, 1),
+                "p95": round(_percentile(latency, 0.95) * 1000, 1),
+                "p99": round(_percentile(latency, 0.99) * 1000, 1),
+            },
+            "queue_wait_ms": {
+                "p50": round(_percentile(wait, 0.50) * 1000, 1),
+                "p95": round(_percentile(wait, 0.95) * 1000, 1),
+            },
+        }
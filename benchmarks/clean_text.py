@@ -0,0 +1,80 @@
+"""
+Microbenchmark for cleaning.clean_text.
+
+Inputs are the annotated resumes rendered to PDF and extracted with the
+layout engine (the raw text the API cleans), plus the stored texts
+themselves. Each input is cleaned with the old multi-pass implementation
+and with the shared one (both modes); the script fails if any output
+differs, then reports the time of each (and of offsets=True).
+
+Usage:
+  python benchmarks/clean_text.py [--data ...] [--repeat 20] [--out report.json]
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+
+from corpus import default_paths, load_tasks, text_to_pdf
+
+# corpus puts backend/ on sys.path
+from cleaning import clean_text
+from extractors import read_pdf
+
+CID = re.compile(r"\(cid:\d+\)")
+
+def clean_text_multipass(s: str) -> str:
+    """The implementation clean_text replaced, kept as the reference."""
+    if not s:
+        return ""
+    s = s.replace("\r\n", "\n").replace("\r", "\n")
+    s = CID.sub(" ", s)
+    s = re.sub(r"([a-z])\n([a-z])", r"\1 \2", s, flags=re.I)
+    s = re.sub(r"[ \t]+", " ", s)
+    s = re.sub(r"\n{3,}", "\n\n", s)
+    return s.strip()
+
+def timed(fn, inputs, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for s in inputs:
+            fn(s)
+        runs.append(time.perf_counter() - t0)
+    return round(statistics.median(runs) * 1000, 3)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the shared text cleaner against the old multi-pass version.")
+    ap.add_argument("--data", nargs="*", default=None, help="Label Studio JSON exports (default: training/annotated/*.json)")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    tasks = load_tasks(args.data or default_paths())
+    inputs = [read_pdf(text_to_pdf(t["text"]), engine="layout") for t in tasks] + [t["text"] for t in tasks]
+
+    mismatches = 0
+    for s in inputs:
+        ref = clean_text_multipass(s)
+        mismatches += clean_text(s) != ref or clean_text(s, offsets=True)[0] != ref
+    report = {
+        "inputs": len(inputs),
+        "chars": sum(len(s) for s in inputs),
+        "mismatches": mismatches,
+        "multipass_ms": timed(clean_text_multipass, inputs, args.repeat),
+        "shared_ms": timed(clean_text, inputs, args.repeat),
+        "shared_offsets_ms": timed(lambda s: clean_text(s, offsets=True), inputs, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cold-start benchmark for the API process.
+
+Each run starts a fresh interpreter, imports backend/main.py and parses one
+plain-text resume, as the first request after a serverless cold start
+would. Reported per startup mode (median of --runs):
+  import_ms       importing main (model included unless MODEL_LAZY=1)
+  first_parse_ms  the first parse_one call (model load included if lazy)
+  startup         pipeline.timings: spaCy import, model load, components kept
+  pdf_libs        whether pdfplumber/pdfminer were imported (they should not be)
+
+--max-import-ms / --max-first-parse-ms make the script exit non-zero when
+the default mode exceeds them, so CI catches cold-start regressions.
+
+Usage:
+  python benchmarks/cold_start.py [--runs 3] [--modes eager lazy full]
+                                  [--max-import-ms 3000] [--max-first-parse-ms 3000] [--out report.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from corpus import BACKEND_DIR, default_paths, load_tasks
+
+MODES = {
+    "eager": {"MODEL_LAZY": "0", "MODEL_TRIM": "1"},
+    "lazy": {"MODEL_LAZY": "1", "MODEL_TRIM": "1"},
+    "lazy_warmup": {"MODEL_LAZY": "1", "MODEL_TRIM": "1", "MODEL_WARMUP": "1"},
+    "full": {"MODEL_LAZY": "0", "MODEL_TRIM": "0"},
+}
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import main, pipeline
+t1 = time.perf_counter()
+pipeline.parse_one("resume.txt", sys.stdin.buffer.read())
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_parse_ms": (t2 - t1) * 1000,
+    "startup": pipeline.timings,
+    "pdf_libs": any(m in sys.modules for m in ("pdfplumber", "pdfminer")),
+}))
+"""
+
+def run_once(mode_env, sample: bytes):
+    env = {**os.environ, **mode_env}
+    proc = subprocess.run([sys.executable, "-c", CHILD, str(BACKEND_DIR)], input=sample,
+                          capture_output=True, env=env, cwd=str(BACKEND_DIR))
+    if proc.returncode != 0:
+        return {"error": proc.stderr.decode("utf-8", "replace").strip().splitlines()[-1]}
+    return json.loads(proc.stdout.decode("utf-8").strip().splitlines()[-1])
+
+def summarise(runs):
+    ok = [r for r in runs if "error" not in r]
+    if not ok:
+        return {"error": runs[0]["error"]}
+    return {
+        "runs": len(ok),
+        "import_ms": round(statistics.median(r["import_ms"] for r in ok), 1),
+        "first_parse_ms": round(statistics.median(r["first_parse_ms"] for r in ok), 1),
+        "startup": ok[-1]["startup"],
+        "pdf_libs": ok[-1]["pdf_libs"],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure API import and first-parse time in fresh processes.")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--modes", nargs="*", default=list(MODES), choices=list(MODES))
+    ap.add_argument("--max-import-ms", type=float, default=None, help="Fail if the eager import is slower")
+    ap.add_argument("--max-first-parse-ms", type=float, default=None, help="Fail if the lazy first parse is slower")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    sample = load_tasks(default_paths()[:1])[0]["text"].encode("utf-8")
+    report = {mode: summarise([run_once(MODES[mode], sample) for _ in range(args.runs)]) for mode in args.modes}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.max_import_ms is not None and report.get("eager", {}).get("import_ms", float("inf")) > args.max_import_ms:
+        failures.append(f"eager import above {args.max_import_ms} ms")
+    if args.max_first_parse_ms is not None and report.get("lazy", {}).get("first_parse_ms", float("inf")) > args.max_first_parse_ms:
+        failures.append(f"lazy first parse above {args.max_first_parse_ms} ms")
+    if failures:
+        print("FAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
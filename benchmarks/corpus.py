@@ -0,0 +1,133 @@
+"""
+Benchmark corpus built from the Label Studio exports in training/annotated.
+
+Each task's text is rendered into a file of the requested type so the whole
+extraction path can be measured; the gold entities come from the task's
+annotations.
+"""
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+BACKEND_DIR = ROOT / "backend"
+ANNOTATED_DIR = ROOT / "training" / "annotated"
+TARGET_LABELS = {"Skill", "Work_Experience", "Education", "Language"}
+
+# Make the backend modules (pipeline, extractors, ...) importable by name.
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def load_tasks(paths: List[str]) -> List[Dict]:
+    tasks = []
+    for path in paths:
+        for t in json.loads(Path(path).read_text(encoding="utf-8-sig")):
+            text = (t.get("data") or {}).get("text") or t.get("text") or ""
+            if text:
+                tasks.append({"id": t.get("id"), "text": text, "gold": gold_entities(t)})
+    return tasks
+
+def default_paths() -> List[str]:
+    return [str(p) for p in sorted(ANNOTATED_DIR.glob("*.json"))]
+
+def norm_entity(label: str, text: str) -> Tuple[str, str]:
+    return label, " ".join(text.lower().split())
+
+def gold_entities(task: Dict) -> Set[Tuple[str, str]]:
+    gold = set()
+    for ann in task.get("annotations", []):
+        for r in ann.get("result", []):
+            labels = r.get("value", {}).get("labels", [])
+            if r.get("type") == "labels" and labels and labels[0] in TARGET_LABELS:
+                gold.add(norm_entity(labels[0], r["value"]["text"]))
+    return gold
+
+def prf(tp: int, fp: int, fn: int) -> Dict[str, float]:
+    p = tp / (tp + fp) if tp + fp else 0.0
+    r = tp / (tp + fn) if tp + fn else 0.0
+    f = 2 * p * r / (p + r) if p + r else 0.0
+    return {"p": round(p, 4), "r": round(r, 4), "f": round(f, 4)}
+
+
+# ---------- file rendering ----------
+PDF_LINES_PER_PAGE = 55
+PDF_LINE_WIDTH = 100
+
+def _pdf_escape(line: str) -> bytes:
+    raw = line.encode("cp1252", errors="replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def text_to_pdf(text: str) -> bytes:
+    """Minimal single-column PDF (Helvetica, WinAnsi) with the text laid out line by line."""
+    lines: List[str] = []
+    for line in text.splitlines():
+        while len(line) > PDF_LINE_WIDTH:
+            lines.append(line[:PDF_LINE_WIDTH])
+            line = line[PDF_LINE_WIDTH:]
+        lines.append(line)
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    for i, page_lines in enumerate(pages):
+        stream = b"BT /F1 10 Tf 40 800 Td 13 TL " + b" ".join(b"(" + _pdf_escape(l) + b") Tj T*" for l in page_lines) + b" ET"
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+def text_to_docx(text: str) -> bytes:
+    """Minimal DOCX with one paragraph per line; tabs become w:tab runs."""
+    import io
+    import zipfile
+    from xml.sax.saxutils import escape
+
+    paras = []
+    for line in text.splitlines():
+        runs = '<w:tab/>'.join(f'<w:t xml:space="preserve">{escape(chunk)}</w:t>' for chunk in line.split("\t"))
+        paras.append(f"<w:p><w:r>{runs}</w:r></w:p>")
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:body>{"".join(paras)}</w:body></w:document>'
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", DOCX_CONTENT_TYPES)
+        z.writestr("_rels/.rels", DOCX_RELS)
+        z.writestr("word/document.xml", document)
+    return buf.getvalue()
@@ -0,0 +1,80 @@
+"""
+Check and time the in-memory DOCX reader against docx2txt.
+
+Every annotated text is rendered to a DOCX (optionally repeated to make
+large documents), then read with extractors.read_docx and with the old
+temp-file + docx2txt.process path. Reports whether the outputs are
+identical, the median time of each and the peak traced memory.
+
+Usage:
+  python benchmarks/docx_reader.py [--data ...] [--scale 50] [--repeat 3] [--out report.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from corpus import default_paths, load_tasks, text_to_docx
+
+# corpus puts backend/ on sys.path
+from extractors import read_docx
+
+try:
+    import docx2txt
+except ImportError:
+    docx2txt = None
+
+
+def read_docx_tempfile(bytes_data: bytes) -> str:
+    """The previous implementation, kept here as the reference."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
+        tmp.write(bytes_data)
+        tmp_path = tmp.name
+    try:
+        text = docx2txt.process(tmp_path) or ""
+    finally:
+        os.unlink(tmp_path)
+    return text
+
+def measure(fn, files, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for data in files:
+            fn(data)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    for data in files:
+        fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"total_ms": round(statistics.median(times) * 1000, 2), "peak_kb": round(peak / 1024, 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare the in-memory DOCX reader with docx2txt.")
+    ap.add_argument("--data", nargs="*", default=None, help="Label Studio JSON exports (default: training/annotated/*.json)")
+    ap.add_argument("--scale", type=int, default=1, help="Repeat each resume text N times to simulate large documents")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    tasks = load_tasks(args.data or default_paths())
+    files = [text_to_docx("\n".join([t["text"]] * args.scale)) for t in tasks]
+
+    report = {"docs": len(files), "scale": args.scale, "in_memory": measure(read_docx, files, args.repeat)}
+    if docx2txt is not None:
+        report["docx2txt"] = measure(read_docx_tempfile, files, args.repeat)
+        report["identical"] = all(read_docx(f) == read_docx_tempfile(f) for f in files)
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
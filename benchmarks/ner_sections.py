@@ -0,0 +1,129 @@
+"""
+Compare section-aware NER (NER_SECTIONS=1) with NER on the whole text.
+
+Every annotated text is cleaned as the API cleans it (keeping where line
+breaks were joined, for the headings) and run through pipeline.run_ner in
+both modes. For each mode the report has:
+
+  speed     NER seconds for the corpus (median of --repeat runs; planning the
+            sections is included), docs/sec and chars/sec
+  chars     characters sent to the NER, matched from the dictionary and skipped
+  entities  P/R/F1 against the gold annotations, overall and per label
+            (label + normalised text, as in pdf_engines.py)
+
+plus the agreement of section mode with whole-text NER (its predictions
+scored against the whole-text ones). With --max-f1-drop the script exits 1
+if section mode loses more gold F1 than that.
+
+Usage:
+  python benchmarks/ner_sections.py [--model backend/model] [--data training/annotated/test.json ...]
+                                    [--skip contact references ...] [--repeat 3] [--out report.json]
+                                    [--max-f1-drop 0.01]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+from corpus import BACKEND_DIR, TARGET_LABELS, default_paths, load_tasks, norm_entity, prf
+
+# corpus puts backend/ on sys.path
+import pipeline
+from sections import SKIP_SECTIONS
+
+Entities = Set[Tuple[str, str]]
+
+
+def predict(texts: List[str], breaks: List[List[int]], sections: bool,
+            batch_size: int) -> Tuple[List[Entities], List[Dict]]:
+    entities, plans = [], []
+    for doc in pipeline.run_ner(texts, batch_size=batch_size, sections=sections, breaks=breaks):
+        entities.append({norm_entity(e.label_, e.text) for e in doc.ents if e.label_ in TARGET_LABELS})
+        plans.append(doc.user_data.get("sections"))
+    return entities, plans
+
+def score(predicted: List[Entities], gold: List[Entities]) -> Dict:
+    counts = {label: Counter() for label in sorted(TARGET_LABELS)}
+    for pred, ref in zip(predicted, gold):
+        for label, c in counts.items():
+            p = {e for e in pred if e[0] == label}
+            g = {e for e in ref if e[0] == label}
+            c["tp"] += len(p & g)
+            c["fp"] += len(p - g)
+            c["fn"] += len(g - p)
+    total = sum(counts.values(), Counter())
+    return {"micro": prf(total["tp"], total["fp"], total["fn"]),
+            "per_label": {label: prf(c["tp"], c["fp"], c["fn"]) for label, c in counts.items()}}
+
+def run_mode(texts: List[str], breaks: List[List[int]], gold: List[Entities], sections: bool,
+             repeat: int, batch_size: int) -> Dict:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        predicted, plans = predict(texts, breaks, sections, batch_size)
+        times.append(time.perf_counter() - t0)
+    seconds = statistics.median(times)
+    total_chars = sum(len(t) for t in texts)
+    chars = Counter()
+    for plan in plans:
+        chars.update(plan["chars"] if plan else {"ner": 0})
+    if not sections:
+        chars = Counter({"ner": total_chars, "dictionary": 0, "skipped": 0})
+    return {
+        "speed": {"ner_s": round(seconds, 3), "docs_per_sec": round(len(texts) / seconds, 1),
+                  "chars_per_sec": round(total_chars / seconds)},
+        "chars": {**dict(chars), "skipped_pct": round(100 * chars["skipped"] / total_chars, 1),
+                  "ner_pct": round(100 * chars["ner"] / total_chars, 1)},
+        "entities": score(predicted, gold),
+        "_predicted": predicted,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark section-aware NER against whole-text NER: speed and entity F1.")
+    ap.add_argument("--model", default=str(BACKEND_DIR / "model"))
+    ap.add_argument("--data", nargs="*", default=None, help="Label Studio JSON exports (default: training/annotated/*.json)")
+    ap.add_argument("--skip", nargs="*", default=list(SKIP_SECTIONS), help="Section kinds section mode skips")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per mode; the median time is reported")
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--out", default=None, help="Write the JSON report here as well")
+    ap.add_argument("--max-f1-drop", type=float, default=None, help="Exit 1 if section mode loses more gold F1")
+    args = ap.parse_args()
+
+    pipeline.load_model(args.model)  # loaded the way the API loads it
+    pipeline.NER_SKIP_SECTIONS = tuple(args.skip)
+    tasks = load_tasks(args.data or default_paths())
+    texts, breaks = map(list, zip(*(pipeline.clean_with_breaks(t["text"]) for t in tasks)))
+    gold = [t["gold"] for t in tasks]
+
+    # one untimed pass so both modes run on a warm pipeline
+    list(pipeline.run_ner(texts[:8], batch_size=args.batch_size, sections=True, breaks=breaks[:8]))
+    whole = run_mode(texts, breaks, gold, False, args.repeat, args.batch_size)
+    sectioned = run_mode(texts, breaks, gold, True, args.repeat, args.batch_size)
+    agreement = score(sectioned.pop("_predicted"), whole.pop("_predicted"))["micro"]
+
+    report = {
+        "docs": len(texts),
+        "chars": sum(len(t) for t in texts),
+        "skip": args.skip,
+        "whole": whole,
+        "sections": sectioned,
+        "speedup": round(whole["speed"]["ner_s"] / sectioned["speed"]["ner_s"], 2),
+        "f1_drop": round(whole["entities"]["micro"]["f"] - sectioned["entities"]["micro"]["f"], 4),
+        "agreement_with_whole": agreement,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_f1_drop is not None and report["f1_drop"] > args.max_f1_drop:
+        print(f"FAIL: section mode loses {report['f1_drop']} F1 (max {args.max_f1_drop})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
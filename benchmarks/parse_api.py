@@ -0,0 +1,225 @@
+"""
+End-to-end benchmark of POST /parse, run against the FastAPI app in-process.
+
+The corpus is fixed: every annotated text (training/annotated/*.json) is
+rendered as a PDF, a DOCX and a TXT file, or the files in --corpus are used
+as they are. The result cache is disabled, so every request does the full
+work.
+
+  latency     requests one at a time, --repeat passes over the corpus.
+              Request time and the per-stage times from the Server-Timing
+              header (upload, extract, clean, ner, group), as p50/p90/p95/p99,
+              overall and per file type.
+  throughput  for each --concurrency N, N client threads send requests
+              until --requests have been answered. Reports docs/sec, latency
+              percentiles and 503s (pool queue full).
+
+The JSON report also records the environment (library versions, model,
+worker settings, git commit), so runs can be compared over time. With
+--baseline, the script compares against an earlier report and exits 1 if
+p95 latency rose or throughput fell by more than --max-slowdown.
+
+Usage:
+  python benchmarks/parse_api.py [--types pdf docx txt] [--docs 50] [--repeat 3]
+                                 [--concurrency 1 4 8] [--requests 200] [--workers 0]
+                                 [--corpus dir/] [--out report.json]
+                                 [--baseline old.json --max-slowdown 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from corpus import BACKEND_DIR, ROOT, default_paths, load_tasks, text_to_docx, text_to_pdf
+
+RENDERERS = {
+    "pdf": text_to_pdf,
+    "docx": text_to_docx,
+    "txt": lambda text: text.encode("utf-8"),
+}
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+LIBRARIES = ("spacy", "pdfplumber", "pdfminer.six", "fastapi", "starlette", "orjson")
+
+Sample = Tuple[str, str, bytes]  # (file type, filename, bytes)
+
+
+def build_corpus(types: List[str], docs: int, corpus_dir: str = None) -> List[Sample]:
+    if corpus_dir:
+        files = sorted(p for p in Path(corpus_dir).iterdir() if p.suffix.lstrip(".").lower() in types)
+        return [(p.suffix.lstrip(".").lower(), p.name, p.read_bytes()) for p in files]
+    tasks = load_tasks(default_paths())
+    tasks = tasks[:docs] if docs else tasks
+    return [(ft, f"resume_{i:04d}.{ft}", RENDERERS[ft](t["text"])) for ft in types for i, t in enumerate(tasks)]
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+    out = {f"p{int(q * 100)}": round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 2)
+           for q in PERCENTILES}
+    out["mean"] = round(statistics.mean(ordered), 2)
+    return out
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    stages = {}
+    for part in filter(None, (p.strip() for p in header.split(","))):
+        name, _, dur = part.partition(";dur=")
+        if dur:
+            stages[name] = float(dur)
+    return stages
+
+def post(client, sample: Sample):
+    file_type, filename, raw = sample
+    t0 = time.perf_counter()
+    r = client.post("/parse", files={"file": (filename, raw, "application/octet-stream")})
+    return r.status_code, (time.perf_counter() - t0) * 1000, parse_server_timing(r.headers.get("server-timing", ""))
+
+
+def run_latency(client, corpus: List[Sample], repeat: int) -> Dict:
+    by_type: Dict[str, Dict[str, List[float]]] = {}
+    errors = 0
+    for _ in range(repeat):
+        for sample in corpus:
+            status, ms, stages = post(client, sample)
+            if status != 200:
+                errors += 1
+                continue
+            for key in (sample[0], "all"):
+                series = by_type.setdefault(key, {"request": []})
+                series["request"].append(ms)
+                for stage, stage_ms in stages.items():
+                    series.setdefault(stage, []).append(stage_ms)
+    return {
+        "requests": repeat * len(corpus),
+        "errors": errors,
+        "ms": {ft: {name: percentiles(s) for name, s in series.items()} for ft, series in by_type.items()},
+    }
+
+def run_throughput(client, corpus: List[Sample], concurrency: int, total: int) -> Dict:
+    def worker(i: int):
+        return post(client, corpus[i % len(corpus)])
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(worker, range(total)))
+    elapsed = time.perf_counter() - t0
+    ok = [ms for status, ms, _ in results if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(ok),
+        "busy_503": sum(1 for status, _, _ in results if status == 503),
+        "errors": sum(1 for status, _, _ in results if status not in (200, 503)),
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_sec": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles(ok),
+    }
+
+
+def environment(health: Dict, args) -> Dict:
+    from importlib import metadata
+
+    versions = {}
+    for lib in LIBRARIES:
+        try:
+            versions[lib] = metadata.version(lib)
+        except metadata.PackageNotFoundError:
+            versions[lib] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT),
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "libraries": versions,
+        "model": health.get("model"),
+        "tier": health.get("tier"),
+        "cache_version": health.get("cache", {}).get("version"),
+        "pool": {"mode": health.get("pool", {}).get("mode"), "workers": health.get("pool", {}).get("workers")},
+        "pdf_engine": args.engine or os.getenv("PDF_ENGINE", "layout"),
+    }
+
+def compare(report: Dict, baseline: Dict, max_slowdown: float) -> List[str]:
+    """Regressions beyond max_slowdown (0.2 = 20%) in p95 latency per file type and in docs/sec."""
+    failures = []
+    old_ms, new_ms = baseline.get("latency", {}).get("ms", {}), report["latency"]["ms"]
+    for ft, series in new_ms.items():
+        old, new = old_ms.get(ft, {}).get("request", {}).get("p95"), series["request"].get("p95")
+        if old and new and new > old * (1 + max_slowdown):
+            failures.append(f"{ft} p95 latency {old} -> {new} ms")
+    old_tp = {t["concurrency"]: t["docs_per_sec"] for t in baseline.get("throughput", [])}
+    for t in report["throughput"]:
+        old = old_tp.get(t["concurrency"])
+        if old and t["docs_per_sec"] < old * (1 - max_slowdown):
+            failures.append(f"throughput at concurrency {t['concurrency']} {old} -> {t['docs_per_sec']} docs/s")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark /parse latency per stage and throughput under concurrency.")
+    ap.add_argument("--types", nargs="*", default=list(RENDERERS), choices=list(RENDERERS))
+    ap.add_argument("--docs", type=int, default=0, help="Annotated texts to render per type (0 = all)")
+    ap.add_argument("--corpus", default=None, help="Directory of resume files to use instead of rendering the annotated texts")
+    ap.add_argument("--repeat", type=int, default=3, help="Passes over the corpus in the latency phase")
+    ap.add_argument("--concurrency", nargs="*", type=int, default=[1, 4, 8])
+    ap.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    ap.add_argument("--workers", type=int, default=None, help="PARSE_WORKERS for the app (0 = in-process thread)")
+    ap.add_argument("--engine", default=None, help="PDF_ENGINE for the app")
+    ap.add_argument("--out", default=None, help="Write the JSON report here as well")
+    ap.add_argument("--baseline", default=None, help="Earlier report to compare against")
+    ap.add_argument("--max-slowdown", type=float, default=0.2)
+    args = ap.parse_args()
+
+    # main reads its settings at import time
+    os.environ["RESULT_CACHE_SIZE"] = "0"
+    os.environ.pop("RESULT_CACHE_DB", None)
+    os.environ.setdefault("PARSE_QUEUE_SIZE", str(max(args.concurrency + [32])))
+    if args.workers is not None:
+        os.environ["PARSE_WORKERS"] = str(args.workers)
+    if args.engine:
+        os.environ["PDF_ENGINE"] = args.engine
+    os.chdir(BACKEND_DIR)
+    from fastapi.testclient import TestClient
+    import main as api
+
+    corpus = build_corpus(args.types, args.docs, args.corpus)
+    if not corpus:
+        sys.exit("No documents to benchmark.")
+
+    with TestClient(api.app) as client:
+        post(client, corpus[0])  # warm up the pool (worker processes load the model on first use)
+        report = {
+            "environment": environment(client.get("/health").json(), args),
+            "corpus": {"docs": len(corpus), "types": {ft: sum(1 for s in corpus if s[0] == ft) for ft in args.types},
+                       "bytes": sum(len(s[2]) for s in corpus)},
+            "latency": run_latency(client, corpus, args.repeat),
+            "throughput": [run_throughput(client, corpus, n, args.requests) for n in args.concurrency],
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        failures = compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.max_slowdown)
+        if failures:
+            print("FAIL: " + "; ".join(failures), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare the PDF extraction engines on the annotated resumes.
+
+Every annotated text is rendered to a PDF, extracted with each engine,
+cleaned and run through the NER. Reports extraction time per document and
+entity-level P/R/F1 against the gold annotations (entities compared as
+label + normalised text, since character offsets differ between engines).
+
+Usage:
+  python benchmarks/pdf_engines.py [--model backend/model] [--data training/annotated/test.json ...]
+                                   [--repeat 3] [--out report.json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from corpus import BACKEND_DIR, default_paths, load_tasks, norm_entity, prf, text_to_pdf
+
+# corpus puts backend/ on sys.path
+import pipeline
+from cleaning import clean_text
+from extractors import PDF_ENGINES, read_pdf
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark PDF extraction engines: speed and downstream entity F1.")
+    ap.add_argument("--model", default=str(BACKEND_DIR / "model"), help="spaCy pipeline used for the F1 part")
+    ap.add_argument("--data", nargs="*", default=None, help="Label Studio JSON exports (default: training/annotated/*.json)")
+    ap.add_argument("--repeat", type=int, default=3, help="Extraction runs per document; the median is reported")
+    ap.add_argument("--out", default=None, help="Write the JSON report here as well")
+    args = ap.parse_args()
+
+    nlp = pipeline.load_model(args.model)  # loaded the way the API loads it
+    tasks = load_tasks(args.data or default_paths())
+    pdfs = [text_to_pdf(t["text"]) for t in tasks]
+
+    report = {"docs": len(tasks), "engines": {}}
+    for name in PDF_ENGINES:
+        times, texts = [], []
+        for pdf in pdfs:
+            runs = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                text = read_pdf(pdf, engine=name)
+                runs.append(time.perf_counter() - t0)
+            times.append(statistics.median(runs))
+            texts.append(clean_text(text))
+
+        tp = fp = fn = 0
+        for task, doc in zip(tasks, nlp.pipe(texts)):
+            pred = {norm_entity(e.label_, e.text) for e in doc.ents}
+            tp += len(pred & task["gold"])
+            fp += len(pred - task["gold"])
+            fn += len(task["gold"] - pred)
+
+        report["engines"][name] = {
+            "extract_ms_mean": round(statistics.mean(times) * 1000, 2),
+            "extract_ms_p95": round(sorted(times)[int(0.95 * (len(times) - 1))] * 1000, 2),
+            "extract_s_total": round(sum(times), 3),
+            "entities": prf(tp, fp, fn),
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
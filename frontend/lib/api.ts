@@ -30,6 +30,8 @@ type BackendResponse = {
   data?: {
     text?: string;
     entities?: Record<string, string[]>;
+    /** Skill / Language mentions merged by canonical id */
+    canonical?: Record<string, { id: string; name: string; count: number }[]>;
   };
   // Some versions may include success/detail; we don't require them
   success?: boolean;
@@ -1,29 +1,10 @@
 import json
 import sys
+from pathlib import Path
 
-import re
-
-CID = re.compile(r"\(cid:\d+\)")
-# replace "-\n" with a space (instead of removing)
-DEHYPH_LINE = re.compile(r"-\s*\n\s*")
-
-def clean_text(s: str) -> str:
-    # normalize newlines
-    s = s.replace("\r\n", "\n").replace("\r", "\n")
-    
-    # remove CID artifacts
-    s = CID.sub(" ", s)
-    
-    # fix words split by newline without hyphen (e.g., "Machine\nLearning")
-    s = re.sub(r"([a-z])\n([a-z])", r"\1 \2", s, flags=re.I)
-    
-    # collapse multiple spaces/tabs → single space
-    s = re.sub(r"[ \t]+", " ", s)
-    
-    # collapse 3+ newlines → just 2 newlines
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    
-    return s.strip()
+# Same cleaner as the API, so training text matches what the model sees when serving.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+from cleaning import clean_text
 
 def main(in_path, out_path):
     with open(in_path, "r", encoding="utf-8") as f:
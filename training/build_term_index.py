@@ -0,0 +1,47 @@
+"""
+Build backend/term_index.json, the canonical skill / language index the API
+uses to merge spellings ("Python 3", "python" -> "Python"; see
+backend/canonical.py).
+
+Usage:
+  python training/build_term_index.py [training/annotated/*.json ...] [--out backend/term_index.json]
+
+Re-run it after changing the dictionaries in backend/terms.py or the
+annotations. The API keys its result cache on the file's content, so
+results parsed with the old index are not served.
+"""
+import argparse, pathlib, sys
+from collections import Counter
+
+from corpus_io import iter_records
+from ls_to_spacy import extract_spans
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+from canonical import CANONICAL_LABELS, build_index
+
+def annotated_terms(paths, counts: Counter):
+    for path in paths:
+        for task in iter_records(path):
+            text = (task.get("data") or {}).get("text") or ""
+            for start, end, label in extract_spans(task):
+                if label in CANONICAL_LABELS and 0 <= start < end <= len(text):
+                    counts[label] += 1
+                    yield label, text[start:end]
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the canonical skill/language index served by the API.")
+    ap.add_argument("annotated", nargs="*", default=sorted(str(p) for p in (ROOT / "training" / "annotated").glob("*.json")),
+                    help="Label Studio exports (JSON/JSONL) whose Skill/Language spans extend the dictionaries")
+    ap.add_argument("--out", default=str(ROOT / "backend" / "term_index.json"))
+    args = ap.parse_args()
+
+    counts = Counter()
+    index = build_index(annotated_terms(args.annotated, counts))
+    index.save(args.out)
+    for label, s in index.stats().items():
+        print(f"{label}: {s['ids']} canonical ids, {s['keys']} keys ({counts[label]} annotated mentions)")
+    print(f"Wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Streaming helpers shared by the training data scripts.
+
+Records are read one at a time (JSONL) and handed to a process pool in
+bounded windows, so memory stays flat however large the corpus is; results
+come back in input order and are written out in shards.
+"""
+import itertools
+import json
+import pathlib
+import sys
+import time
+from multiprocessing import Pool
+from typing import Callable, Iterable, Iterator, List, Optional
+
+
+def iter_records(path) -> Iterator[dict]:
+    """Yield objects from a JSONL file (streamed) or a JSON array file (loaded whole)."""
+    p = pathlib.Path(path)
+    with p.open("r", encoding="utf-8-sig") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == "[":
+            f.seek(0)
+            yield from json.load(f)
+            return
+        f.seek(0)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def batched(iterable: Iterable, n: int) -> Iterator[List]:
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+def parallel_map(fn: Callable, items: Iterable, workers: int = 1, window: int = 256,
+                 initializer: Optional[Callable] = None, initargs: tuple = ()) -> Iterator:
+    """
+    Ordered map over items using `workers` processes.
+
+    Pool.imap would drain the whole input into its task queue, so items are
+    fed in windows of `window` and at most one window is in flight.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(fn, items)
+        return
+    with Pool(workers, initializer=initializer, initargs=initargs) as pool:
+        chunksize = max(1, window // (workers * 4))
+        for batch in batched(items, window):
+            yield from pool.imap(fn, batch, chunksize=chunksize)
+
+
+class Progress:
+    def __init__(self, label: str, every_s: float = 2.0):
+        self.label = label
+        self.every_s = every_s
+        self.count = 0
+        self.started = self.last = time.perf_counter()
+
+    def update(self, n: int = 1) -> None:
+        self.count += n
+        now = time.perf_counter()
+        if now - self.last >= self.every_s:
+            self.last = now
+            self._print(now)
+
+    def done(self) -> None:
+        self._print(time.perf_counter())
+
+    def _print(self, now: float) -> None:
+        elapsed = now - self.started
+        rate = self.count / elapsed if elapsed else 0.0
+        print(f"  {self.label}: {self.count} done ({rate:.1f}/s, {elapsed:.0f}s)", file=sys.stderr, flush=True)
+
+
+class JsonShardWriter:
+    """
+    Write records to `out` or, with shard_size > 0, to out-00000.<ext>, out-00001.<ext>, ...
+
+    A .jsonl path gets one object per line; anything else gets a JSON array
+    per file (what Label Studio imports), written incrementally.
+    """
+
+    def __init__(self, out, shard_size: int = 0):
+        self.out = pathlib.Path(out)
+        self.shard_size = shard_size
+        self.jsonl = self.out.suffix == ".jsonl"
+        self.paths: List[pathlib.Path] = []
+        self._f = None
+        self._in_shard = 0
+        self.total = 0
+
+    def _open(self) -> None:
+        if self.shard_size > 0:
+            path = self.out.with_name(f"{self.out.stem}-{len(self.paths):05d}{self.out.suffix}")
+        else:
+            path = self.out
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = path.open("w", encoding="utf-8")
+        self.paths.append(path)
+        self._in_shard = 0
+        if not self.jsonl:
+            self._f.write("[\n")
+
+    def _close(self) -> None:
+        if self._f is None:
+            return
+        if not self.jsonl:
+            self._f.write("\n]\n")
+        self._f.close()
+        self._f = None
+
+    def write(self, record: dict) -> None:
+        if self._f is None or (self.shard_size > 0 and self._in_shard >= self.shard_size):
+            self._close()
+            self._open()
+        data = json.dumps(record, ensure_ascii=False)
+        if self.jsonl:
+            self._f.write(data + "\n")
+        else:
+            self._f.write((",\n" if self._in_shard else "") + data)
+        self._in_shard += 1
+        self.total += 1
+
+    def close(self) -> None:
+        if self._f is None and not self.paths:
+            self._open()  # empty input still gets a (valid, empty) output file
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,201 @@
+"""
+Distil the served NER model into a smaller, faster CPU student and gate it.
+
+  1. silver  the teacher (backend/model by default) labels the training texts,
+             plus any unlabelled texts given with --texts
+  2. train   spaCy trains STUDENT_CFG, a slimmer CNN than the teacher's, on
+             those predictions. The best checkpoint is chosen on gold dev.
+  3. gate    teacher and student are scored on gold test (entity F1) and
+             timed (docs/sec). <out>/gate.json records both. The script
+             exits with 1 if the student loses more than --max-f1-drop F1
+             or is less than --min-speedup times faster.
+
+Usage:
+  python training/distill_ner.py --out training/student [--teacher backend/model]
+                                 [--texts unlabelled.jsonl ...] [--with-gold] [--max-steps 2000]
+  python training/distill_ner.py --out training/student --gate-only   # re-run step 3
+
+A student that passes is served as the fast tier: copy <out>/model-best to
+backend/model_fast (or point FAST_MODEL_DIR at it) and set MODEL_TIER=fast.
+"""
+import argparse, json, pathlib, statistics, sys, time
+
+import spacy
+from spacy.cli.train import train as spacy_train
+from spacy.tokens import DocBin
+from spacy.training import Example
+
+from corpus_io import Progress, iter_records
+from ls_to_spacy import fill_docbin, iter_tasks
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+ANNOTATED = ROOT / "training" / "annotated"
+# Load teacher and student the way the API does (only what "ner" needs).
+sys.path.insert(0, str(ROOT / "backend"))
+from cleaning import clean_text
+from pipeline import unused_components
+
+# The teacher embeds a 4-layer, width-96 CNN; the student halves depth and width.
+STUDENT_CFG = r"""
+[paths]
+train = "<<TRAIN_PATH>>"
+dev   = "<<DEV_PATH>>"
+
+[nlp]
+lang = "<<LANG>>"
+pipeline = ["ner"]
+batch_size = 1000
+
+[components]
+
+[components.ner]
+factory = "ner"
+
+[components.ner.model]
+@architectures = "spacy.TransitionBasedParser.v2"
+state_type = "ner"
+extra_state_tokens = false
+hidden_width = 48
+maxout_pieces = 2
+use_upper = false
+nO = null
+
+[components.ner.model.tok2vec]
+@architectures = "spacy.HashEmbedCNN.v2"
+pretrained_vectors = null
+width = 64
+depth = 2
+embed_size = 2000
+window_size = 1
+maxout_pieces = 2
+subword_features = true
+
+[training]
+dev_corpus = "corpora.dev"
+train_corpus = "corpora.train"
+seed = 42
+optimizer = {"@optimizers":"Adam.v1"}
+accumulate_gradient = 1
+patience = 1600
+max_steps = <<MAX_STEPS>>
+eval_frequency = 100
+dropout = 0.2
+gpu_allocator = "none"
+
+[training.batcher]
+@batchers = "spacy.batch_by_padded.v1"
+discard_oversize = false
+size = 2000
+buffer = 256
+get_length = null
+
+[corpora]
+
+[corpora.train]
+@readers = "spacy.Corpus.v1"
+path = ${paths.train}
+
+[corpora.dev]
+@readers = "spacy.Corpus.v1"
+path = ${paths.dev}
+"""
+
+def load_served(path):
+    return spacy.load(str(path), exclude=unused_components(path))
+
+def gold_docbin(path, lang) -> DocBin:
+    db, _, _, _ = fill_docbin(spacy.blank(lang), iter_tasks(path))
+    return db
+
+def silver_docbin(teacher, texts) -> DocBin:
+    db = DocBin(store_user_data=False)
+    progress = Progress("silver")
+    for doc in teacher.pipe(texts, batch_size=32):
+        db.add(doc)
+        progress.update()
+    progress.done()
+    return db
+
+def unlabelled_texts(paths):
+    for path in paths:
+        for obj in iter_records(path):
+            raw = obj.get("text") or (obj.get("data") or {}).get("text") or ""
+            text = clean_text(raw)
+            if text:
+                yield text
+
+def score(nlp, gold: DocBin, repeat: int = 5):
+    refs = list(gold.get_docs(nlp.vocab))
+    examples = [Example(nlp.make_doc(ref.text), ref) for ref in refs]
+    f1 = nlp.evaluate(examples)["ents_f"]
+    texts = [ref.text for ref in refs] * repeat
+    runs = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in nlp.pipe(texts, batch_size=32):
+            pass
+        runs.append(time.perf_counter() - t0)
+    return {"ents_f": round(f1, 4), "docs_per_sec": round(len(texts) / statistics.median(runs), 1)}
+
+def gate(teacher_dir, student_dir, test_path, lang, max_f1_drop, min_speedup):
+    test = gold_docbin(test_path, lang)
+    teacher = score(load_served(teacher_dir), test)
+    student = score(load_served(student_dir), test)
+    report = {
+        "test": str(test_path),
+        "teacher": {"path": str(teacher_dir), **teacher},
+        "student": {"path": str(student_dir), **student},
+        "f1_drop": round(teacher["ents_f"] - student["ents_f"], 4),
+        "speedup": round(student["docs_per_sec"] / teacher["docs_per_sec"], 2),
+        "max_f1_drop": max_f1_drop,
+        "min_speedup": min_speedup,
+    }
+    report["passed"] = report["f1_drop"] <= max_f1_drop and report["speedup"] >= min_speedup
+    return report
+
+def main():
+    ap = argparse.ArgumentParser(description="Distil backend/model into a smaller student NER and gate it on test F1 and speed.")
+    ap.add_argument("--out", required=True, help="Output directory (silver data, config, model-best, gate.json)")
+    ap.add_argument("--teacher", default=str(ROOT / "backend" / "model"))
+    ap.add_argument("--lang", choices=["en", "de"], default="en")
+    ap.add_argument("--train", default=str(ANNOTATED / "train.json"), help="Label Studio export whose texts the teacher labels")
+    ap.add_argument("--dev", default=str(ANNOTATED / "dev.json"), help="Gold dev set for checkpoint selection")
+    ap.add_argument("--test", default=str(ANNOTATED / "test.json"), help="Gold test set for the gate")
+    ap.add_argument("--texts", nargs="*", default=[], help="Extra unlabelled texts (JSON/JSONL with 'text') for the teacher to label")
+    ap.add_argument("--with-gold", action="store_true", help="Also train on the gold annotations of --train")
+    ap.add_argument("--max-steps", type=int, default=2000)
+    ap.add_argument("--max-f1-drop", type=float, default=0.02, help="Largest acceptable F1 loss vs the teacher (0-1 scale)")
+    ap.add_argument("--min-speedup", type=float, default=1.5, help="Smallest acceptable docs/sec ratio student/teacher")
+    ap.add_argument("--gate-only", action="store_true", help="Skip training; gate an existing <out>/model-best")
+    args = ap.parse_args()
+
+    out = pathlib.Path(args.out).resolve()
+    student_dir = out / "model-best"
+    if not args.gate_only:
+        out.mkdir(parents=True, exist_ok=True)
+        teacher = load_served(args.teacher)
+        texts = [t["data"]["text"] for t in iter_tasks(args.train) if (t.get("data") or {}).get("text")]
+        train_db = silver_docbin(teacher, list(texts) + list(unlabelled_texts(args.texts)))
+        if args.with_gold:
+            train_db.merge(gold_docbin(args.train, args.lang))
+        train_db.to_disk(out / "train.spacy")
+        gold_docbin(args.dev, args.lang).to_disk(out / "dev.spacy")
+        print(f"Silver training set: {len(train_db)} docs")
+
+        cfg_text = STUDENT_CFG
+        cfg_text = cfg_text.replace("<<TRAIN_PATH>>", (out / "train.spacy").as_posix())
+        cfg_text = cfg_text.replace("<<DEV_PATH>>", (out / "dev.spacy").as_posix())
+        cfg_text = cfg_text.replace("<<LANG>>", args.lang)
+        cfg_text = cfg_text.replace("<<MAX_STEPS>>", str(args.max_steps))
+        cfg_path = out / "config.student.cfg"
+        cfg_path.write_text(cfg_text, encoding="utf-8")
+        spacy_train(config_path=str(cfg_path), output_path=str(out), overrides={}, use_gpu=-1)
+
+    report = gate(args.teacher, student_dir, args.test, args.lang, args.max_f1_drop, args.min_speedup)
+    (out / "gate.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    if not report["passed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,21 @@
-import sys, json, srsly, pathlib
+import argparse, hashlib, json, pathlib, sqlite3, time
+from collections import Counter, deque
+from typing import Dict, Iterator, List, Optional, Tuple
 from spacy.tokens import DocBin
 import spacy
 
+from corpus_io import Progress, batched, iter_records, parallel_map
+
 TARGET_LABELS = {"Skill", "Work_Experience", "Education", "Language"}
 
+CHUNK_SIZE = 256  # tasks per worker job when not sharding
+DROP_REASONS = ("invalid", "overlap", "misaligned")
+# Bump when fill_docbin's output for a task or the cached row format changes, so cached Docs are rebuilt.
+CACHE_SCHEMA = 2
+
 def iter_tasks(obj):
-    """Yield Label Studio task objects from either JSON array or JSONL file."""
-    p = pathlib.Path(obj)
-    txt = p.read_text(encoding="utf-8-sig")
-    if txt.lstrip().startswith("["):
-        for rec in json.loads(txt):
-            yield rec
-    else:
-        for line in txt.splitlines():
-            line = line.strip()
-            if not line: 
-                continue
-            yield json.loads(line)
+    """Yield Label Studio task objects from either JSON array or JSONL file (JSONL is streamed)."""
+    return iter_records(obj)
 
 def extract_spans(task, use_predictions=False):
     """
@@ -41,65 +40,281 @@ def extract_spans(task, use_predictions=False):
             spans.append((start, end, label))
     return spans
 
+def resolve_spans(doc, spans, dropped: Counter) -> List:
+    """
+    Keep the first of any overlapping spans (by start, then end) and align
+    the survivors to tokens. A single sweep: with spans sorted by start, a
+    span overlaps an accepted one iff it starts before the furthest accepted
+    end. Rejections are counted in `dropped` as (label, reason).
+    """
+    n = len(doc.text)
+    ents = []
+    taken_until = 0
+    for start, end, label in sorted(spans, key=lambda x: (x[0], x[1])):
+        if start < 0 or start >= end or end > n:
+            dropped[label, "invalid"] += 1
+            continue
+        if start < taken_until:
+            dropped[label, "overlap"] += 1
+            continue
+        span = doc.char_span(start, end, label=label, alignment_mode="contract")
+        if span is None:
+            dropped[label, "misaligned"] += 1
+            continue
+        taken_until = end
+        ents.append(span)
+    return ents
+
+def report_dropped(dropped: Counter, prefix: str = "") -> None:
+    labels = sorted({label for label, _ in dropped})
+    for label in labels:
+        counts = ", ".join(f"{reason} {dropped[label, reason]}" for reason in DROP_REASONS if dropped[label, reason])
+        print(f"{prefix}dropped {label}: {counts}")
+
 def make_docbin(nlp, tasks, use_predictions=False):
+    db, good, bad, dropped = fill_docbin(nlp, tasks, use_predictions)
+    print(f"Built {good} docs with entities; {bad} had none.")
+    report_dropped(dropped)
+    return db
+
+def fill_docbin(nlp, tasks, use_predictions=False) -> Tuple[DocBin, int, int, Counter]:
     db = DocBin(store_user_data=False)
     bad, good = 0, 0
+    dropped: Counter = Counter()
     for t in tasks:
         text = (t.get("data") or {}).get("text") or t.get("text") or ""
         if not text:
             continue
         doc = nlp.make_doc(text)
-        ents = []
-        spans = extract_spans(t, use_predictions=use_predictions)
-        # filter overlapping/invalid spans
-        char_taken = [False] * (len(text) + 1)
-        for start, end, label in sorted(spans, key=lambda x: (x[0], x[1])):
-            if start >= end or end > len(text):
-                continue
-            if any(char_taken[start:end]):
-                continue
-            span = doc.char_span(start, end, label=label, alignment_mode="contract")
-            if span is None:
-                continue
-            for i in range(start, end):
-                char_taken[i] = True
-            ents.append(span)
+        ents = resolve_spans(doc, extract_spans(t, use_predictions=use_predictions), dropped)
         doc.ents = ents
         if ents:
             good += 1
         else:
             bad += 1
         db.add(doc)
-    print(f"Built {good} docs with entities; {bad} had none.")
-    return db
+    return db, good, bad, dropped
 
-def main():
-    if len(sys.argv) < 6:
-        print("Usage: python ls_to_spacy.py <lang:en|de> <input_train.json[l]> <input_dev.json[l]> <input_test.json[l]> <out_dir> [--use-pred]")
-        sys.exit(2)
-    
-    lang, train_in, dev_in, test_in, out_dir = sys.argv[1:6]
-    use_pred = ("--use-pred" in sys.argv)
+# ---------- parallel / sharded conversion ----------
+_worker_nlp = None
+_worker_use_pred = False
 
-    model = "en_core_web_sm" if lang == "en" else "de_core_news_sm"
-    nlp = spacy.blank("en") if lang == "en" else spacy.blank("de")  # tokenizer base for Doc creation
+def _init_worker(lang: str, use_predictions: bool) -> None:
+    global _worker_nlp, _worker_use_pred
+    _worker_nlp = spacy.blank(lang)  # tokenizer base for Doc creation
+    _worker_use_pred = use_predictions
 
-    train_tasks = list(iter_tasks(train_in))
-    dev_tasks = list(iter_tasks(dev_in))
-    test_tasks = list(iter_tasks(test_in))
+def _convert_chunk(tasks: List[dict]) -> Tuple[bytes, int, int, Counter]:
+    db, good, bad, dropped = fill_docbin(_worker_nlp, tasks, use_predictions=_worker_use_pred)
+    return db.to_bytes(), good, bad, dropped
 
-    out = pathlib.Path(out_dir)
-    out.mkdir(parents=True, exist_ok=True)
+def convert_split(name, in_path, out: pathlib.Path, lang, use_pred=False, workers=1, shard_size=0):
+    """
+    Convert one split. With shard_size > 0 every `shard_size` tasks become
+    out/<name>/NNNNN.spacy (spaCy's corpus reader takes the directory), so
+    nothing accumulates in memory; otherwise chunks are merged into
+    out/<name>.spacy as before.
+    """
+    chunks = batched(iter_tasks(in_path), shard_size or CHUNK_SIZE)
+    results = parallel_map(_convert_chunk, chunks, workers, window=max(2, 2 * workers),
+                           initializer=_init_worker, initargs=(lang, use_pred))
+    if shard_size:
+        target = out / name
+        target.mkdir(parents=True, exist_ok=True)
+        for stale in target.glob("*.spacy"):
+            stale.unlink()
+    else:
+        target = out / f"{name}.spacy"
+        merged = DocBin(store_user_data=False)
+
+    progress = Progress(name)
+    good = bad = shards = 0
+    dropped: Counter = Counter()
+    for data, g, b, d in results:
+        if shard_size:
+            (target / f"{shards:05d}.spacy").write_bytes(data)
+        else:
+            merged.merge(DocBin(store_user_data=False).from_bytes(data))
+        shards += 1
+        good += g
+        bad += b
+        dropped += d
+        progress.update(g + b)
+    if not shard_size:
+        merged.to_disk(target)
+    progress.done()
+    print(f"{name}: built {good} docs with entities; {bad} had none -> {target}")
+    report_dropped(dropped, prefix=f"{name}: ")
+    return target
+
+# ---------- incremental conversion ----------
+class DocCache:
+    """
+    Converted Docs keyed by a hash of everything the conversion reads (see
+    task_key). Each row holds a one-doc DocBin in spaCy's serialised format
+    (pack_doc), so a hit is merged into the output without tokenizing or
+    aligning the task again. Rows that no run has used since
+    `start` are removed by prune().
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(str(path))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, doc BLOB NOT NULL, has_ents INTEGER NOT NULL,"
+            " dropped TEXT NOT NULL, used REAL NOT NULL)"
+        )
+        self.start = time.time()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[bytes, bool, Counter]]:
+        found = {}
+        for part in batched(keys, 500):  # SQLite caps the number of host parameters
+            marks = ",".join("?" * len(part))
+            for key, doc, has_ents, dropped in self.db.execute(
+                    f"SELECT key, doc, has_ents, dropped FROM docs WHERE key IN ({marks})", part):
+                found[key] = (doc, bool(has_ents), _counter_from_json(dropped))
+            self.db.execute(f"UPDATE docs SET used = ? WHERE key IN ({marks})", [self.start, *part])
+        return found
+
+    def put_many(self, rows: List[Tuple[str, bytes, bool, Counter]]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO docs (key, doc, has_ents, dropped, used) VALUES (?, ?, ?, ?, ?)",
+            [(key, doc, int(has_ents), _counter_to_json(dropped), self.start) for key, doc, has_ents, dropped in rows],
+        )
+        self.db.commit()
+
+    def prune(self) -> int:
+        n = self.db.execute("DELETE FROM docs WHERE used < ?", (self.start,)).rowcount
+        self.db.commit()
+        return n
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+def _counter_to_json(c: Counter) -> str:
+    return json.dumps([[label, reason, n] for (label, reason), n in c.items()])
+
+def _counter_from_json(s: str) -> Counter:
+    return Counter({(label, reason): n for label, reason, n in json.loads(s)})
+
+def task_key(task, lang, use_predictions=False) -> Optional[str]:
+    """Content hash of what fill_docbin reads from a task (None for tasks it skips)."""
+    text = (task.get("data") or {}).get("text") or task.get("text") or ""
+    if not text:
+        return None
+    payload = [CACHE_SCHEMA, spacy.__version__, lang, text, extract_spans(task, use_predictions)]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def pack_doc(db: DocBin) -> bytes:
+    """A one-doc DocBin, serialised with spaCy's own format (DocBin.to_bytes)."""
+    return db.to_bytes()
 
-    train_db = make_docbin(nlp, train_tasks, use_predictions=use_pred)
-    dev_db = make_docbin(nlp, dev_tasks, use_predictions=use_pred)
-    test_db = make_docbin(nlp, test_tasks, use_predictions=use_pred)
+def unpack_doc(blob: bytes) -> DocBin:
+    return DocBin(store_user_data=False).from_bytes(blob)
 
-    train_db.to_disk(out / "train.spacy")
-    dev_db.to_disk(out / "dev.spacy")
-    test_db.to_disk(out / "test.spacy")
+def _convert_each(tasks: List[dict]) -> List[Tuple[bytes, bool, Counter]]:
+    """One packed Doc per task, for the cache."""
+    out = []
+    for task in tasks:
+        db, good, _, dropped = fill_docbin(_worker_nlp, [task], use_predictions=_worker_use_pred)
+        out.append((pack_doc(db), good > 0, dropped))
+    return out
 
-    print(f"Wrote {out/'train.spacy'}, {out/'dev.spacy'}, and {out/'test.spacy'}")
+def convert_split_cached(name, in_path, out: pathlib.Path, lang, cache: DocCache, use_pred=False,
+                         workers=1, shard_size=0):
+    """
+    convert_split, but only tasks whose key is not in the cache are
+    tokenized and aligned (in the worker processes). Everything else is
+    merged from the cache. The output files are the same.
+    """
+    plans = deque()  # (keys, cached) per chunk, in the order the chunks go to the workers
+    hits = 0
+
+    def missing_chunks() -> Iterator[List[dict]]:
+        nonlocal hits
+        for chunk in batched(iter_tasks(in_path), shard_size or CHUNK_SIZE):
+            keyed = [(task_key(t, lang, use_pred), t) for t in chunk]
+            keys = [k for k, _ in keyed if k is not None]
+            cached = cache.get_many(keys)
+            hits += len(cached)
+            plans.append((keys, cached))
+            yield [t for k, t in keyed if k is not None and k not in cached]
+
+    results = parallel_map(_convert_each, missing_chunks(), workers, window=max(2, 2 * workers),
+                           initializer=_init_worker, initargs=(lang, use_pred))
+    if shard_size:
+        target = out / name
+        target.mkdir(parents=True, exist_ok=True)
+        for stale in target.glob("*.spacy"):
+            stale.unlink()
+    else:
+        target = out / f"{name}.spacy"
+        merged = DocBin(store_user_data=False)
+
+    progress = Progress(name)
+    good = bad = shards = converted = 0
+    dropped: Counter = Counter()
+    for fresh in results:
+        keys, cached = plans.popleft()
+        new_rows = [(k, *row) for k, row in zip([k for k in keys if k not in cached], fresh)]
+        cache.put_many(new_rows)
+        converted += len(new_rows)
+        rows = {**cached, **{k: (doc, has_ents, d) for k, doc, has_ents, d in new_rows}}
+        part = DocBin(store_user_data=False) if shard_size else merged
+        for key in keys:
+            doc, has_ents, d = rows[key]
+            part.merge(unpack_doc(doc))
+            good += has_ents
+            bad += not has_ents
+            dropped += d
+        if shard_size:
+            part.to_disk(target / f"{shards:05d}.spacy")
+        shards += 1
+        progress.update(len(keys))
+    if not shard_size:
+        merged.to_disk(target)
+    progress.done()
+    print(f"{name}: built {good} docs with entities; {bad} had none -> {target} "
+          f"({hits} from cache, {converted} converted)")
+    report_dropped(dropped, prefix=f"{name}: ")
+    return target
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert Label Studio exports into spaCy DocBin files.")
+    ap.add_argument("lang", choices=["en", "de"])
+    ap.add_argument("train_in", help="input_train.json[l]")
+    ap.add_argument("dev_in", help="input_dev.json[l]")
+    ap.add_argument("test_in", help="input_test.json[l]")
+    ap.add_argument("out_dir")
+    ap.add_argument("--use-pred", action="store_true", help="Read spans from 'predictions' instead of 'annotations'")
+    ap.add_argument("--workers", type=int, default=1, help="Worker processes (default: 1)")
+    ap.add_argument("--shard-size", type=int, default=0,
+                    help="Docs per .spacy shard, written to <out_dir>/<split>/; 0 writes <split>.spacy")
+    ap.add_argument("--cache", default=None,
+                    help="SQLite file of converted Docs reused across runs (default: <out_dir>/.doc_cache.sqlite)")
+    ap.add_argument("--no-cache", action="store_true", help="Convert every task from scratch")
+    args = ap.parse_args()
+
+    out = pathlib.Path(args.out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    splits = (("train", args.train_in), ("dev", args.dev_in), ("test", args.test_in))
+    if args.no_cache:
+        targets = [
+            convert_split(name, path, out, args.lang, args.use_pred, args.workers, args.shard_size)
+            for name, path in splits
+        ]
+    else:
+        cache = DocCache(args.cache or out / ".doc_cache.sqlite")
+        targets = [
+            convert_split_cached(name, path, out, args.lang, cache, args.use_pred, args.workers, args.shard_size)
+            for name, path in splits
+        ]
+        pruned = cache.prune()
+        cache.close()
+        if pruned:
+            print(f"Removed {pruned} cached docs no longer in any split")
+    print("Wrote " + ", ".join(str(t) for t in targets))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
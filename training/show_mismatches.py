@@ -1,11 +1,34 @@
+"""
+Evaluate a spaCy NER model on a .spacy test set and print its mismatches per resume.
+
+The test docs go through nlp.pipe (--batch-size, --n-process). Besides
+the mismatch list, the script prints per-label precision/recall/F1 (exact
+span + label) and a gold-vs-predicted confusion matrix, and records
+docs/sec. --json-out writes all of it, so every model candidate gets an
+accuracy and a speed number from one run.
+
+Usage:
+  python training/show_mismatches.py --model training/student/model-best --test corpus/test.spacy
+                                     [--n-process 4] [--batch-size 64] [--json-out report.json] [--quiet]
+"""
 import argparse
+import json
 import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
 import spacy
 from spacy.tokens import DocBin
 from typing import List, Tuple, Set, Dict
 
+# Load the model the way the API does (only what "ner" needs).
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+from pipeline import unused_components
+
 
 TARGET_LABELS = {"Skill", "Work_Experience", "Education", "Language"}
+NO_LABEL = "No label"
 
 
 def load_docs(spacy_path: str, nlp) -> List:
@@ -54,63 +77,138 @@ def index_by_span(spans: Set[Tuple[int, int, str]]) -> Dict[Tuple[int, int], str
     return d
 
 
+def find_mismatches(text: str, gold_spans, pred_spans, confusion: Counter) -> List[Tuple[str, str, str]]:
+    """(fragment, predicted label, gold label) per disagreement; every span pair is counted in confusion."""
+    gold_by_span = index_by_span(gold_spans)
+    pred_by_span = index_by_span(pred_spans)
+
+    mismatches: List[Tuple[str, str, str]] = []
+
+    # 1) Gold entities: check if predicted at same span
+    for (s, e), gold_lab in gold_by_span.items():
+        pred_lab = pred_by_span.get((s, e), NO_LABEL)
+        confusion[gold_lab, pred_lab] += 1
+        if pred_lab != gold_lab:
+            mismatches.append((text[s:e], pred_lab, gold_lab))
+
+    # 2) Predicted entities with no gold at same span (false positives)
+    for (s, e), pred_lab in pred_by_span.items():
+        if (s, e) not in gold_by_span:
+            confusion[NO_LABEL, pred_lab] += 1
+            mismatches.append((text[s:e], pred_lab, NO_LABEL))
+    return mismatches
+
+
+def prf(tp: int, fp: int, fn: int) -> Dict[str, float]:
+    p = tp / (tp + fp) if tp + fp else 0.0
+    r = tp / (tp + fn) if tp + fn else 0.0
+    f = 2 * p * r / (p + r) if p + r else 0.0
+    return {"p": round(p, 4), "r": round(r, 4), "f": round(f, 4), "tp": tp, "fp": fp, "fn": fn}
+
+
+def print_summary(report: Dict) -> None:
+    print(f"{'label':<16} {'P':>6} {'R':>6} {'F1':>6} {'gold':>6} {'pred':>6}")
+    for label, m in report["per_label"].items():
+        print(f"{label:<16} {m['p']:>6.3f} {m['r']:>6.3f} {m['f']:>6.3f} {m['tp'] + m['fn']:>6} {m['tp'] + m['fp']:>6}")
+    m = report["micro"]
+    print(f"{'micro':<16} {m['p']:>6.3f} {m['r']:>6.3f} {m['f']:>6.3f}")
+    print()
+
+    cols = report["confusion"]["labels"]
+    width = max(len(c) for c in cols) + 1
+    print("confusion (rows gold, columns predicted)")
+    print(" " * width + "".join(f"{c:>{width}}" for c in cols))
+    for gold_lab, row in zip(cols, report["confusion"]["matrix"]):
+        print(f"{gold_lab:<{width}}" + "".join(f"{n:>{width}}" for n in row))
+    print()
+    speed = report["speed"]
+    print(f"{report['docs']} docs in {speed['seconds']} s: {speed['docs_per_sec']} docs/sec "
+          f"(batch_size={speed['batch_size']}, n_process={speed['n_process']})")
+
+
 def main():
-    ap = argparse.ArgumentParser(description="Print spaCy NER mismatches per resume.")
+    ap = argparse.ArgumentParser(description="Print spaCy NER mismatches per resume, with per-label scores and speed.")
     ap.add_argument("--model", default="D:/resumes/50/models/resume_ner_en/model-best", help="Path to trained spaCy pipeline, e.g. D:/models/resume_ner_en/model-best")
     ap.add_argument("--test", default="D:/resumes/50/spacy_data/test.spacy", help="Path to test.spacy")
     ap.add_argument("--only", nargs="*", default=None, help="Optional whitelist of labels to consider (default: Skill Work_Experience Education Language)")
+    ap.add_argument("--batch-size", type=int, default=64, help="nlp.pipe batch size")
+    ap.add_argument("--n-process", type=int, default=1, help="nlp.pipe worker processes (start-up time is included in docs/sec)")
+    ap.add_argument("--json-out", default=None, help="Write scores, confusion matrix, mismatches and speed as JSON")
+    ap.add_argument("--quiet", action="store_true", help="Do not print the per-resume mismatch list")
     args = ap.parse_args()
 
-    nlp = spacy.load(args.model)
+    # trimming reads config.cfg from a model directory; installed packages (en_core_web_sm) load whole
+    exclude = unused_components(args.model) if Path(args.model).is_dir() else []
+    nlp = spacy.load(args.model, exclude=exclude)
     docs = load_docs(args.test, nlp)
 
     labels = set(args.only) if args.only else TARGET_LABELS
 
-    resume_idx = 0
-    any_output = False
+    t0 = time.perf_counter()
+    pred_docs = list(nlp.pipe((d.text for d in docs), batch_size=args.batch_size, n_process=args.n_process))
+    seconds = time.perf_counter() - t0
 
-    for gold_doc in docs:
-        resume_idx += 1
-        text = gold_doc.text
+    counts = {label: Counter() for label in sorted(labels)}
+    confusion: Counter = Counter()
+    per_resume = []
 
-        # Run model
-        pred_doc = nlp(text)
+    for resume_idx, (gold_doc, pred_doc) in enumerate(zip(docs, pred_docs), start=1):
+        text = gold_doc.text
 
         # Filter to target labels
         gold_spans = {(s, e, lab) for (s, e, lab) in ents_as_set(gold_doc) if lab in labels}
         pred_spans = {(s, e, lab) for (s, e, lab) in ents_as_set(pred_doc) if lab in labels}
 
-        gold_by_span = index_by_span(gold_spans)
-        pred_by_span = index_by_span(pred_spans)
-
-        mismatches: List[Tuple[str, str, str]] = []
-
-        # 1) Gold entities: check if predicted at same span
-        for (s, e), gold_lab in gold_by_span.items():
-            pred_lab = pred_by_span.get((s, e))
-            frag = text[s:e]
-            if pred_lab is None:
-                mismatches.append((frag, "No label", gold_lab))
-            elif pred_lab != gold_lab:
-                mismatches.append((frag, pred_lab, gold_lab))
-
-        # 2) Predicted entities with no gold at same span (false positives)
-        for (s, e), pred_lab in pred_by_span.items():
-            if (s, e) not in gold_by_span:
-                frag = text[s:e]
-                mismatches.append((frag, pred_lab, "No label"))
+        for _, _, lab in gold_spans & pred_spans:
+            counts[lab]["tp"] += 1
+        for _, _, lab in pred_spans - gold_spans:
+            counts[lab]["fp"] += 1
+        for _, _, lab in gold_spans - pred_spans:
+            counts[lab]["fn"] += 1
 
+        mismatches = find_mismatches(text, gold_spans, pred_spans, confusion)
         if mismatches:
-            any_output = True
-            name = guess_name(text)
-            print(f"Resume # {resume_idx} {name}")
-            for frag, pred_lab, gold_lab in mismatches:
-                frag_clean = " ".join(frag.split())
-                print(f"\"{frag_clean}\" \"{pred_lab}\" \"{gold_lab}\"")
+            per_resume.append({
+                "resume": resume_idx,
+                "name": guess_name(text),
+                "mismatches": [{"text": " ".join(frag.split()), "pred": pred_lab, "gold": gold_lab}
+                               for frag, pred_lab, gold_lab in mismatches],
+            })
+
+    total = Counter()
+    for c in counts.values():
+        total.update(c)
+    cols = sorted(labels) + [NO_LABEL]
+    report = {
+        "model": args.model,
+        "test": args.test,
+        "docs": len(docs),
+        "per_label": {label: prf(c["tp"], c["fp"], c["fn"]) for label, c in counts.items()},
+        "micro": prf(total["tp"], total["fp"], total["fn"]),
+        "confusion": {"labels": cols, "matrix": [[confusion[g, p] for p in cols] for g in cols]},
+        "speed": {
+            "seconds": round(seconds, 3),
+            "docs_per_sec": round(len(docs) / seconds, 1) if seconds else 0.0,
+            "chars_per_sec": round(sum(len(d.text) for d in docs) / seconds) if seconds else 0,
+            "batch_size": args.batch_size,
+            "n_process": args.n_process,
+        },
+        "mismatches": per_resume,
+    }
+
+    if not args.quiet:
+        for entry in per_resume:
+            print(f"Resume # {entry['resume']} {entry['name']}")
+            for m in entry["mismatches"]:
+                print(f"\"{m['text']}\" \"{m['pred']}\" \"{m['gold']}\"")
             print()  # blank line between resumes
+        if not per_resume:
+            print("No mismatches found — predictions match gold spans exactly for the selected labels.")
+            print()
 
-    if not any_output:
-        print("No mismatches found — predictions match gold spans exactly for the selected labels.")
+    print_summary(report)
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
 
 
 if __name__ == "__main__":